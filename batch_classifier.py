@@ -0,0 +1,329 @@
+# batch version of `Comparer.determine_behavior()`. The time series of every iteration in the sweep are stacked into
+#     (iterations x timesteps) arrays padded with NaN, and the features and votes are computed for all of them at once.
+#     - The votes are the same as the ones from `Comparer` (without the reasons)
+#     - Decisions are encoded as FS -> 0, RO -> 1, RC -> 2
+import sys
+import json
+import numpy as np
+from time import perf_counter
+from statistics import median
+from scipy.signal import find_peaks
+
+from pathExtract import TASK_ID, TRIAL_ID
+from post_processing import ClassifierParams, DEFAULT_PARAMS
+from sweep_grid import SweepGrid, decode_labels
+
+try:
+    TASK_ID = sys.argv[1]
+except IndexError:
+    pass
+try:
+    TRIAL_ID = sys.argv[2]
+except IndexError:
+    pass
+
+# the keys of the time series used in the classification
+SERIES = ['disc_xs', 'disc_ys', 'disc_rs', 'disc_vx', 'crater_xs', 'mound_xs', 'mound_ys']
+
+
+def load_sweep(paths: list[str]) -> dict:
+    """
+    Function to load the data extracts and stack them
+        - Args
+            - `paths` : the data extract (json) paths, in the order of the iterations
+        - Returns
+            - dictionary with:
+                - `<series>` : (iterations x timesteps) array for every key in `SERIES` (padded with NaN)
+                - `<series>_len` : the length of each series
+                - `num_timesteps` : the number of timesteps (length of the first key in the extract)
+                - `contact_pIDs` : the number of unique contact particles
+                - `contact_length` : the number of timesteps in contact with the bed
+    """
+    datas = []
+    for path in paths:
+        with open(path, 'r') as file:
+            datas.append( json.load(file) )
+
+    stack = {
+        'num_timesteps' : np.array([ len(data[next(iter(data))]) for data in datas ]),
+        'contact_pIDs' : np.array([ len(data['contact_pIDs']) for data in datas ]),
+        'contact_length' : np.array([ np.count_nonzero(data.get('contact_counts', [])) for data in datas ]),
+    }
+
+    for key in SERIES:
+        # older data extracts don't have the disc velocity
+        series = [ data.get(key, []) for data in datas ]
+        lengths = np.array([ len(values) for values in series ])
+
+        stacked = np.full( (len(datas), max(lengths.max(), 1)), np.nan )
+        for row, values in enumerate(series):
+            stacked[row, :len(values)] = values
+
+        stack[key] = stacked
+        stack[f"{key}_len"] = lengths
+
+    return stack
+
+
+def _row_gradient(values: np.ndarray, lengths: np.ndarray, spacing: np.ndarray) -> np.ndarray:
+    """
+    Function to take `np.gradient()` of each row, where each row has its own length and spacing
+    """
+    rows = np.arange(len(values))
+    last = lengths-1
+
+    gradient = np.full(values.shape, np.nan)
+    gradient[:, 1:-1] = (values[:, 2:] - values[:, :-2]) / (2.*spacing[:, None])
+    gradient[:, 0] = (values[:, 1] - values[:, 0]) / spacing
+    gradient[rows, last] = (values[rows, last] - values[rows, last-1]) / spacing
+
+    # clearing out the padding
+    gradient[ np.arange(values.shape[1]) >= lengths[:, None] ] = np.nan
+    return gradient
+
+
+def _forward_fill_idx(mask: np.ndarray) -> np.ndarray:
+    """
+    Function to get the index of the last True value before each element of every row (-1 if there isn't any)
+    """
+    idx = np.where(mask, np.arange(mask.shape[1]), -1)
+    last = np.maximum.accumulate(idx, axis=1)
+    return np.concatenate( (np.full((len(mask), 1), -1), last[:, :-1]), axis=1 )
+
+
+def batch_features(stack: dict, params: ClassifierParams = DEFAULT_PARAMS) -> dict:
+    """
+    Function to compute the features used for the votes for all iterations at once
+        - Args
+            - `stack` : the stacked time series from `load_sweep()`
+            - `params` : the thresholds used in the classification
+        - Returns
+            - dictionary of arrays (one value per iteration)
+    """
+    num_iter = len(stack['num_timesteps'])
+    rows = np.arange(num_iter)
+    num_timesteps = stack['num_timesteps']
+
+    disc_xs, disc_ys = stack['disc_xs'], stack['disc_ys']
+    disc_r = stack['disc_rs'][:, 0]
+
+    #* finding the peaks of the disc
+    max_disc_y = batch_peaks(stack, params.peak_distance)
+
+    #* airborne state analysis
+    # using the disc velocity if it was extracted, and the gradient of the disc position if not
+    has_vx = stack['disc_vx_len'] > 0
+    vel_xs = np.where(
+        has_vx[:, None],
+        _pad_to(stack['disc_vx'], disc_xs.shape[1]),
+        _row_gradient(disc_xs, stack['disc_xs_len'], num_timesteps)
+    )
+    vel_len = np.where(has_vx, stack['disc_vx_len'], stack['disc_xs_len'])
+    acc_xs = _row_gradient(vel_xs, vel_len, num_timesteps)*(1e8)
+
+    counted = np.arange(vel_xs.shape[1]) < vel_len[:, None]
+    v0 = vel_xs[:, :1]
+    low, high = params.vel_band
+    ignored = ( (-1e-06 < vel_xs) & (vel_xs < 1e-06) ) | ( (v0*low < vel_xs) & (vel_xs < v0*high) )
+    ignored[:, 0] = True
+    counted &= ~ignored
+
+    flat = (-params.acc_band < acc_xs) & (acc_xs < params.acc_band)
+    ends = counted & ~flat
+    flat_count = np.cumsum(counted & flat, axis=1)
+
+    # the number of flat timesteps since the previous end of a run
+    prev_end = _forward_fill_idx(ends)
+    prev_count = np.where( prev_end >= 0, flat_count[rows[:, None], np.maximum(prev_end, 0)], 0 )
+    runs = np.where(ends, 2*(flat_count - prev_count), -1)
+
+    has_runs = ends.any(axis=1)
+    airborne = np.where(has_runs, runs.max(axis=1), 0)
+
+    #* the per-timestep indicators (only up to the shortest of the series, like zip())
+    num = np.min([ stack[f"{key}_len"] for key in ('mound_ys', 'disc_ys', 'mound_xs', 'disc_xs', 'crater_xs') ] + [vel_len], axis=0)
+    width = disc_xs.shape[1]
+    valid = np.arange(width) < num[:, None]
+
+    mound_ys = _pad_to(stack['mound_ys'], width)
+    mound_xs = _pad_to(stack['mound_xs'], width)
+    crater_xs = _pad_to(stack['crater_xs'], width)
+
+    # switches in height between the mound and the disc (starting as 'up')
+    side = np.where(valid & (disc_ys > mound_ys), 1, 0) - np.where(valid & (disc_ys < mound_ys), 1, 0)
+    sided = side != 0
+    prev_sided = _forward_fill_idx(sided)
+    prev_side = np.where( prev_sided >= 0, side[rows[:, None], np.maximum(prev_sided, 0)], 1 )
+    switched = (sided & (side != prev_side)).astype(int)
+
+    switches_before = 1 + np.cumsum(switched, axis=1) - switched
+    switches = 1 + switched.sum(axis=1)
+
+    ricochet = ( valid & ( (disc_ys - disc_r[:, None]*params.radius_ratio) > mound_ys ) & (switches_before > 1) ).any(axis=1)
+    crater_out = ( valid & ( (disc_xs - 3*disc_r[:, None]) > crater_xs ) ).any(axis=1)
+    surpasses = ( valid & (disc_xs > mound_xs) ).any(axis=1)
+
+    # the maximum of the whole mound series
+    max_mound = np.where( np.arange(stack['mound_ys'].shape[1]) < stack['mound_ys_len'][:, None], stack['mound_ys'], -np.inf ).max(axis=1)
+
+    return {
+        'max_disc_y' : max_disc_y,
+        'disc_r' : disc_r,
+        'max_mound' : max_mound,
+        'switches' : switches,
+        'ricochet' : ricochet,
+        'crater_out' : crater_out,
+        'surpasses' : surpasses,
+        'has_runs' : has_runs,
+        'airborne' : airborne,
+        'contact_pIDs' : stack['contact_pIDs'],
+        'contact_length' : stack['contact_length'],
+        'num_timesteps' : stack['num_timesteps'],
+    }
+
+
+def batch_peaks(stack: dict, distance: int) -> np.ndarray:
+    """
+    Function to get the height of the first peak of the disc in each iteration (the median if there aren't any). \
+        scipy's `find_peaks()` only works on one series at a time, so this is the one feature that loops.
+    """
+    max_disc_y = np.empty(len(stack['disc_ys']))
+    for row, length in enumerate(stack['disc_ys_len']):
+        ys = stack['disc_ys'][row, :length]
+        peaks, _ = find_peaks(ys, distance = distance)
+        max_disc_y[row] = ys[peaks][0] if len(peaks) != 0 else median(ys)
+
+    return max_disc_y
+
+
+def _pad_to(values: np.ndarray, width: int) -> np.ndarray:
+    """
+    Function to pad (with NaN) or cut the rows of a stacked array to the width passed in
+    """
+    if values.shape[1] >= width:
+        return values[:, :width]
+    return np.concatenate( (values, np.full((len(values), width-values.shape[1]), np.nan)), axis=1 )
+
+
+def batch_vote(features: dict, params: ClassifierParams = DEFAULT_PARAMS) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Function to vote on the behaviors (same votes as `post_processing.vote()`) for all iterations at once
+        - Args
+            - `features` : the features from `batch_features()`
+            - `params` : the thresholds used in the classification
+        - Returns
+            - `decisions` : the behavior of each iteration (FS -> 0, RO -> 1, RC -> 2)
+            - `confidence` : the confidence of each decision
+            - `votes` : (iterations x 3) array of the shifted FS/RO/RC votes
+    """
+    num_iter = len(features['switches'])
+    FS, RO, RC = (np.zeros(num_iter, dtype=int) for _ in range(3))
+
+    few_switches = features['switches'] < 3
+    airborne = features['airborne']
+
+    # the disc goes higher than the mound after a switch
+    ricochet = features['ricochet']
+    FS -= ricochet; RO -= ricochet; RC += ricochet
+
+    # switches
+    FS += np.where(few_switches, 1, -1)
+
+    # crater out
+    FS += np.where(features['crater_out'], -1, 1)
+
+    # bottom of the impactor higher than the max height of the mound
+    max_mound = features['max_mound']
+    clearance = features['max_disc_y'] - features['disc_r']
+    above = max_mound < clearance
+    FS -= above; RO -= above
+    RC += ( ((clearance - max_mound) / max_mound)//0.1 ).astype(int)
+
+    # no airborne runs at all
+    no_runs = ~features['has_runs']
+    FS += no_runs; RO += no_runs; RC -= no_runs
+
+    # never surpasses the mound
+    under = ~features['surpasses']
+    FS += 2*(under & few_switches)
+    FS += 2*under; RO -= under; RC -= under
+
+    # airborne
+    flying = airborne > 1
+    RC += np.where(flying, airborne//params.airborne_div, -1)
+    FS += ~flying; RO += ~flying
+
+    # contact particles
+    min_RO = params.min_RO
+    many = features['contact_pIDs'] > min_RO
+    RO += np.where(many, np.abs(features['contact_pIDs']-min_RO)//4, 0)
+    FS -= many; RC -= many
+
+    # length of contact
+    if params.contact_weight:
+        FS += (params.contact_weight*features['contact_length']/features['num_timesteps']).astype(int)
+
+    votes = np.stack((FS, RO, RC), axis=1)
+
+    #* behavior is the one with the most votes (the first one on a tie), then the tiebreakers
+    decisions = np.argmax(votes, axis=1)
+    decisions[ (FS == RO) & (RO > RC) ] = 1
+    decisions[ (RO == RC) & (RO > FS) ] = 2
+
+    #* shifting the votes to make the minimum zero, and working with only the top 2 choices
+    votes = votes - votes.min(axis=1, keepdims=True)
+    top2 = np.where(
+        (votes[:, 0] == 0)[:, None], votes[:, [1, 2]],
+        np.where( (votes[:, 1] == 0)[:, None], votes[:, [0, 2]], votes[:, [0, 1]] )
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.abs(top2[:, 0]-top2[:, 1]) / top2.max(axis=1)
+    confidence = np.array([ round(float(value), 2) for value in ratio ])
+
+    return decisions, confidence, votes
+
+
+def classify_sweep(task_id: str, trial_id: str) -> tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Function to classify all iterations of a sweep at once
+        - Returns
+            - `decisions` : (angles x velocities) grid of behaviors (FS -> 0, RO -> 1, RC -> 2)
+            - `confidence` : (angles x velocities) grid of the confidence values
+            - `features` : the features of each iteration (flat, in the same order as the grid)
+    """
+    sweep = SweepGrid()
+    paths = [
+        f"data_Extracts/data_Extract_{task_id}_{trial_id}/outputs_{key}.json" for key in sweep.flat_keys
+    ]
+    features = batch_features( load_sweep(paths) )
+    decisions, confidence, _ = batch_vote(features)
+
+    return sweep.from_flat(decisions), sweep.from_flat(confidence), features
+
+
+def main():
+    decisions, confidence, features = classify_sweep(TASK_ID, TRIAL_ID)
+
+    # saving the computer behavior the same way as extractTest.py
+    behaviors = decode_labels(decisions)
+
+    compDict = {}
+    for idx, key in enumerate(SweepGrid().flat_keys):
+        compDict[key] = {
+            "behavior" : behaviors.flat[idx],
+            "confidence" : float(confidence.flat[idx]),
+            "contact_pIDs" : int(features['contact_pIDs'][idx]),
+            "airborne" : int(features['airborne'][idx]),
+            "surpasses" : bool(features['surpasses'][idx]),
+            "crater_out" : bool(features['crater_out'][idx]),
+        }
+
+    with open(f"behaviors/computer/Computer_Behavior_{TASK_ID}_{TRIAL_ID}.json",'w') as file:
+        json.dump(compDict, file, indent=4)
+
+if __name__ == "__main__":
+    start = perf_counter()
+    main()
+    end = perf_counter()
+
+    print(f"Total runtime: { int( (end-start)//60 ) }:{(end-start)%60 : .2f}")
@@ -3,6 +3,116 @@ from statistics import median
 from time import perf_counter
 import numpy as np
 from math import dist
+import queue
+import threading
+from collections import deque
+
+
+def _parse_rows(lines: list[str], data_idx: int, box_width: float, box_height: float, where: "ParticleFilter", disc_id: int) -> dict:
+    """
+    Function to read the particle rows of a frame, starting at `data_idx` and going until the next timestep \
+        (or the end of `lines`). Only the rows that pass `where` are converted.
+
+    Returns dictionary that looks like:
+
+            T_dict = {
+                particleID: {
+                    x : x_coord,
+                    y : y_coord,
+                    r : radius
+                }
+            }
+    """
+    # the filter parts checked before/after the coordinates are converted
+    ids = where.ids
+    check_position = where.has_position
+
+    # initializing the dictionary
+    timeDict = {}
+    
+    # looping through the lines
+    try:
+        while lines[data_idx] != "ITEM: TIMESTEP\n": #looping until the next timestep
+
+            line = lines[data_idx]
+            data_idx += 1
+
+            #* only the ID is read before deciding to keep the particle
+            pID = int(line.split(None, 1)[0])
+
+            # ignoring the disc data
+            if pID == disc_id:
+                continue
+
+            # without any IDs passed in, everything below the disc ID is read
+            if ids is None:
+                if pID > disc_id:
+                    continue
+            elif pID not in ids:
+                continue
+
+            data_line = line.split()
+            x = float(data_line[2])*box_width
+            y = float(data_line[3])*box_height
+
+            if check_position and not where.accepts(x, y):
+                continue
+
+            # assigning the values from the line into a dictionary
+            # assigning the dictionary as a value to a key that's the particle id
+            timeDict[pID] = {
+                'x' : x,
+                'y' : y,
+                # 'r' : float(data_line[-1])
+                'r' : float(data_line[5]) #! this should change accordingly
+            }
+
+    except IndexError:
+        pass
+
+    return timeDict
+
+
+def prefetch(iterable, depth: int = 2):
+    """
+    Generator that runs `iterable` on a background thread and yields its items in order. \
+        At most `depth` items are kept ready ahead of the consumer, so the memory stays bounded.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def producer():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                buffer.put( (True, item) )
+        except BaseException as error:
+            # passing the error on to the consumer
+            buffer.put( (False, error) )
+        finally:
+            buffer.put( (False, None) )
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            ok, item = buffer.get()
+            if not ok:
+                if item is not None:
+                    raise item
+                return
+            yield item
+
+    finally:
+        # unblocking the producer if the consumer stopped early
+        stop.set()
+        while thread.is_alive():
+            try:
+                buffer.get(timeout=0.1)
+            except queue.Empty:
+                pass
 
 
 class RegFile:
@@ -40,13 +150,17 @@ class RegFile:
         # return { idx+1 : int(self.lines[idx+1].split()[0])  for idx, line in enumerate(self.lines) if line == "ITEM: TIMESTEP\n" }        
         return [ (idx+1 , int(self.lines[idx+1].split()[0]))  for idx, line in enumerate(self.lines) if line == "ITEM: TIMESTEP\n" ]
 
-    def __get_bed_at(self, idx = None, timestep = None, include_only: list[int] = None):
+    def __get_bed_at(self, idx = None, timestep = None, include_only: list[int] = None, where: "ParticleFilter" = None):
         """
         Method to get the particles in the initial bed (particle bed at first timestep) 
             - idx: int
                 - the index where the data section starts (where the timestep is explicitly set)
             - timestep: int
                 - parameter to see if the timestep passed in matches the timestep at the index
+            - include_only: list[int]
+                - the particle IDs to read in
+            - where: ParticleFilter
+                - predicate checked on the raw rows. Rows that don't pass are never converted
         
         Returns dictionary that looks like:
         
@@ -65,66 +179,255 @@ class RegFile:
             idx, timestep = self.idx0, self.timestep0
 
         #* if the input is empty, get all the pIDs
-        if include_only is None:
-            
-            include_only = list(range(self.__DISC_ID))
-
+        if where is None:
+            where = ParticleFilter(ids=include_only)
+        elif include_only is not None:
+            where = where.restrict(include_only)
+        
         # checking if the timestep is correct
         if timestep != int(self.lines[idx]):
             raise IndexError(f"The TIMESTEP at {idx} does not match the timestep passed in the argument: {timestep}(arg) != {self.lines[idx]}")
 
-        # index where the actual data starts printing
-        data_idx = idx + self.DATA_OFFSET
+        # print(f"time: {end-start: .4f}   Num Particles: {len(include_only)}")
+        #* index where the actual data starts printing
+        return _parse_rows(self.lines, idx + self.DATA_OFFSET, self.box_width, self.box_height, where, self.__DISC_ID)
+
+    def get_init_bed(self, where: "ParticleFilter" = None):
+        """
+        Method to get the bed data at the first timestep"""
+        return _InitBed(self.__get_bed_at(where=where))
 
-        # initializing the dictionary
-        timeDict = {}
+    def get_bed(self, idx: int, timestep: int, include_only: list[int], where: "ParticleFilter" = None):
+        """
+        Method to get the bed data at any given timestep.
         
-        # looping through the lines
-        try:
-            while self.lines[data_idx] != "ITEM: TIMESTEP\n": #looping until the next timestep
+            - the arguments are mandatory, the bed size is smaller
+            - `where` can be passed in to filter the particles while the frame is read"""
+        return _Bed(self.__get_bed_at(idx, timestep, include_only, where))
+
+        # return timeDict
+
+
+class ParticleFilter:
+    """
+    Predicate for the particles of a frame, checked on the raw rows while the dump is read. \
+        Any combination of the conditions can be given, and a particle has to meet all of them.
+
+        - `ids` : the particle IDs to keep
+        - `bbox` : the (left, right, down, up) region to keep
+        - `y_range` : the (low, high) heights to keep
+    """
+
+    def __init__(self, ids: list[int] = None, bbox: tuple[float,float,float,float] = None, y_range: tuple[float,float] = None) -> None:
+        self.ids = None if ids is None else set(ids)
+        self.bbox = bbox
+        self.y_range = y_range
+
+        self.has_position = (bbox is not None) or (y_range is not None)
+
+    def restrict(self, ids: list[int]) -> "ParticleFilter":
+        """
+        Method to get a copy of the filter that only keeps the particle IDs passed in as well
+        """
+        ids = set(ids) if self.ids is None else self.ids.intersection(ids)
+        return ParticleFilter(ids, self.bbox, self.y_range)
+
+    def accepts(self, x: float, y: float) -> bool:
+        """
+        Method to check the position conditions for a particle
+        """
+        if self.bbox is not None:
+            left, right, down, up = self.bbox
+            if not ((left < x < right) and (down < y < up)):
+                return False
+        if self.y_range is not None:
+            low, high = self.y_range
+            if not (low < y < high):
+                return False
+        return True
+
+
+class FrameReader:
+    """
+    Class to stream the bed frames of a dump file one at a time. Unlike `RegFile`, the whole file is never held in memory.
+        - `filename` : the dmp.reg file to read
+        - `timesteps` : the timesteps to read (all of them if None). The other frames are skipped without being parsed, \
+            and the file is not read any further after the last one.
+    """
+    # indices for specific things (relative to the "ITEM: TIMESTEP" line of the frame)
+    DIM_OFFSET = 5
+    DATA_OFFSET = 9
+
+    # this changes according to the disc id
+    __DISC_ID = 108614
+
+    def __init__(self, filename: str, timesteps: list[int] = None) -> None:
+        self.filename = filename
+        self.timesteps = None if timesteps is None else set(timesteps)
+
+    def raw_frames(self):
+        """
+        Generator for the (timestep, lines) of each frame that is read in
+        """
+        last = None if self.timesteps is None else max(self.timesteps)
 
-                data_line = self.lines[data_idx].split()
+        with open(self.filename, 'r') as file:
+            frame = None
+            keep = False
+            for line in file:
+
+                if line == "ITEM: TIMESTEP\n":
+                    if frame is not None:
+                        timestep = int(frame[1])
+                        if keep:
+                            yield timestep, frame
+
+                        # no need to go any further
+                        if last is not None and timestep >= last:
+                            return
 
-                # ignoring the disc data
-                if int(data_line[0]) == self.__DISC_ID:
-                    data_idx += 1
+                    frame = [line]
                     continue
-                if int(data_line[0]) in include_only:
-                    # data_idx += 1
-                    # continue
-
-                    # assigning the values from the line into a dictionary
-                    idxDict = {
-                        'x' : float(data_line[2])*self.box_width,
-                        'y' : float(data_line[3])*self.box_height,
-                        # 'r' : float(data_line[-1])
-                        'r' : float(data_line[5]) #! this should change accordingly
-                    }
 
-                    # assigning the dictionary as a value to a key that's the particle id
-                    #* data_line[0] --> pID
-                    timeDict[int(data_line[0])] = idxDict
-                data_idx += 1
+                # deciding whether or not to keep the frame at its timestep line
+                if len(frame) == 1:
+                    keep = (self.timesteps is None) or (int(line) in self.timesteps)
+                    frame.append(line)
+                elif keep:
+                    frame.append(line)
 
-        except IndexError:
-            pass
+            if frame is not None and keep:
+                yield int(frame[1]), frame
 
-        # print(f"time: {end-start: .4f}   Num Particles: {len(include_only)}")
-        return timeDict
+    def parse(self, lines: list[str], where: ParticleFilter = None) -> dict:
+        """
+        Method to get the particle dictionary (same as `RegFile`) from the lines of a frame
+        """
+        box_width, box_height = ( float(line.split().pop(1)) for line in lines[self.DIM_OFFSET: self.DIM_OFFSET+2] )
 
-    def get_init_bed(self):
+        return _parse_rows(lines, self.DATA_OFFSET, box_width, box_height, where or ParticleFilter(), self.__DISC_ID)
+
+    def frames(self, where: ParticleFilter = None, prefetch_depth: int = 2):
         """
-        Method to get the bed data at the first timestep"""
-        return _InitBed(self.__get_bed_at())
+        Generator for the (timestep, particle dictionary) of each frame that is read in.
+            - `where` : the filter applied to the particles while the rows are read
+            - `prefetch_depth` : the number of frames read and parsed ahead on a background thread (0 to read in sequence)
+        """
+        parsed = ( (timestep, self.parse(lines, where)) for timestep, lines in self.raw_frames() )
+
+        if prefetch_depth > 0:
+            return prefetch(parsed, prefetch_depth)
+        return parsed
 
-    def get_bed(self, idx: int, timestep: int, include_only: list[int]):
+    def kinematics(self, where: ParticleFilter = None, ids: list[int] = None, dt: float = 1.0, prefetch_depth: int = 2):
         """
-        Method to get the bed data at any given timestep.
-        
-            - the arguments are mandatory, the bed size is smaller"""
-        return _Bed(self.__get_bed_at(idx, timestep, include_only))
+        Generator for the velocities and accelerations of the particles (see `KinematicsWindow`), \
+            computed as the frames stream in. The first and last frames have none.
+            - `where` : the filter applied to the particles while the rows are read
+            - `ids` : the particles to follow (the filter IDs, or the particles of the first frame if None)
+            - `dt` : the time of one timestep
+        """
+        if ids is None and where is not None and where.ids is not None:
+            ids = sorted(where.ids)
 
-        # return timeDict
+        window = KinematicsWindow(ids, dt)
+        for timestep, bedDict in self.frames(where, prefetch_depth):
+            state = window.push(timestep, bedDict)
+            if state is not None:
+                yield state
+
+
+class KinematicsWindow:
+    """
+    Class to get the velocity and acceleration of every particle from a sliding window of the last three frames, \
+        so the memory does not grow with the number of frames. The derivatives are the central differences \
+        (for uneven frame spacing too) at the middle frame of the window.
+        - `ids` : the particles to follow (the particles of the first frame if None). Particles missing \
+            from a frame are NaN.
+        - `dt` : the time of one timestep
+    """
+
+    def __init__(self, ids: list[int] = None, dt: float = 1.0) -> None:
+        self.ids = None if ids is None else np.array(list(ids))
+        self.dt = dt
+
+        self.__times = deque(maxlen=3)
+        self.__frames = deque(maxlen=3)
+
+    def push(self, timestep: int, bedDict: dict) -> dict:
+        """
+        Method to add the next frame to the window
+            - Returns dictionary with (`None` until the window is full)
+                - `timestep` : the timestep of the middle frame
+                - `ids` : (K,) array of the particle IDs
+                - `pos` : (K x 2) array of the positions
+                - `r` : (K,) array of the radii
+                - `vel`, `acc` : (K x 2) arrays of the velocities and accelerations
+        """
+        if self.ids is None:
+            self.ids = np.array(list(bedDict))
+
+        nan = { 'x' : np.nan, 'y' : np.nan, 'r' : np.nan }
+        rows = [ bedDict.get(pID, nan) for pID in self.ids.tolist() ]
+
+        self.__times.append(timestep)
+        self.__frames.append( np.array([ (row['x'], row['y'], row['r']) for row in rows ], dtype=float).reshape(-1, 3) )
+
+        if len(self.__frames) < 3:
+            return None
+
+        (t0, t1, t2), (f0, f1, f2) = self.__times, ( frame[:, :2] for frame in self.__frames )
+        h1, h2 = (t1-t0)*self.dt, (t2-t1)*self.dt
+
+        # same as the interior of np.gradient() for uneven spacing
+        vel = ( h1**2*f2 - h2**2*f0 + (h2**2-h1**2)*f1 ) / ( h1*h2*(h1+h2) )
+        acc = 2*( h1*f2 - (h1+h2)*f1 + h2*f0 ) / ( h1*h2*(h1+h2) )
+
+        return {
+            'timestep' : t1,
+            'ids' : self.ids,
+            'pos' : f1,
+            'r' : self.__frames[1][:, 2],
+            'vel' : vel,
+            'acc' : acc,
+        }
+
+
+def particle_masses(radii: np.ndarray, density: float = 1.0) -> np.ndarray:
+    """
+    Function to get the masses of (spherical) particles from their radii
+    """
+    return 4/3*np.pi*np.asarray(radii)**3*density
+
+def kinetic_energy(vel: np.ndarray, masses: np.ndarray) -> np.ndarray:
+    """
+    Function to get the kinetic energy of each particle
+        - Args
+            - `vel` : (K x 2) array of the velocities
+            - `masses` : (K,) array of the masses
+    """
+    return 0.5*np.asarray(masses)*np.sum(np.asarray(vel)**2, axis=1)
+
+def agitation_stats(vel: np.ndarray, threshold: float) -> dict:
+    """
+    Function to summarize how agitated the particles are (NaN particles are left out)
+        - Args
+            - `vel` : (K x 2) array of the velocities
+            - `threshold` : the speed above which a particle counts as moving (in the units of `vel`)
+        - Returns
+            - dictionary with the `mean`, `rms` and `max` speed and the number of `moving` particles
+    """
+    speeds = np.hypot(vel[:, 0], vel[:, 1])
+    speeds = speeds[np.isfinite(speeds)]
+    if len(speeds) == 0:
+        return { 'mean' : np.nan, 'rms' : np.nan, 'max' : np.nan, 'moving' : 0 }
+
+    return {
+        'mean' : float(speeds.mean()),
+        'rms' : float(np.sqrt(np.mean(speeds**2))),
+        'max' : float(speeds.max()),
+        'moving' : int(np.count_nonzero(speeds > threshold)),
+    }
 
 
 class DiscFile(RegFile):
@@ -266,6 +569,8 @@ class _InitBed:
         self.__initDict = initDict
 
         # self.__Profile = self.__makeProfile() IDK if there's a need for this
+        #* made once, when it is first needed
+        self.profile = None
         
 
     def make_profile(self):
@@ -275,7 +580,7 @@ class _InitBed:
             - `condition_bed` : a list of indices that satisfy a certain condition
             - Returns : `P_Profile` object
         """
-        condition_bed = self.is_greater('y', 0.14)
+        condition_bed = set(self.is_greater('y', 0.14))
 
         return P_Profile(
             np.array([
@@ -312,11 +617,14 @@ class _InitBed:
 
         #* looking at the particles higher than 80% of the max height --> that is where the surface would be
 
-        profile = self.make_profile()
+        if self.profile is None:
+            self.profile = self.make_profile()
+        profile = self.profile
         
-        # looping through the dictionary to find the surface partices
-        for key in self.__initDict:
-            self.__initDict[key]['surface'] = profile.P_is_surface(self.__initDict[key]['x'], self.__initDict[key]['y'])
+        # finding the surface particles all at once (same as P_is_surface() on each of them)
+        flags = profile.P_is_surface_all(self.get_data('x', as_array=True), self.get_data('y', as_array=True))
+        for key, flag in zip(self.__initDict, flags.tolist()):
+            self.__initDict[key]['surface'] = flag
         
         
         return [ k for k, v in self.__initDict.items() if v['surface'] == 1 ]
@@ -659,5 +967,89 @@ class P_Profile:
     
 
 
+    #* array versions of the methods above (same results, the pairs are only looked for in a window of x)
+    def P_is_surface_all(self, xs, ys) -> np.ndarray:
+        """
+        Method that tells whether or not each of the given particles is a surface particle (same as `P_is_surface()`)
+            - `xs`, `ys` : arrays of the particle coordinates
+            - Returns : array of 1 (surface particle) or 0
+        """
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+
+        above_counts = np.zeros(len(xs), dtype=int)
+
+        # a particle further away in x than the largest radius can never be within the diameter
+        for point_idx, pos_idx in self.__window_pairs(xs, self.__positions()[:, 2].max(initial=0.0)):
+            pos = self.__positions()[pos_idx]
+            above = (
+                (pos[:, 1] >= ys[point_idx]) & 
+                (pos[:, 0] > xs[point_idx]-pos[:, 2]) & (pos[:, 0] < xs[point_idx]+pos[:, 2])
+            )
+            above_counts += np.bincount(point_idx[above], minlength=len(xs))
+
+        return (above_counts <= 1).astype(int)
+
+    def P_count_near_all(self, xs, ys, radius_multiplier) -> np.ndarray:
+        """
+        Method to count the number of particles near each of the given particles (same as `P_count_near_particle()`)
+            - `xs`, `ys` : arrays of the particle coordinates
+            - `radius_multiplier` : the scale factor that multiplies the radius of the particle
+            - Returns : array of the counts
+        """
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+
+        counts = np.ones(len(xs), dtype=int)
+
+        #* the window is a bit wider than the largest distance so that the rounding of dist() can't drop a pair
+        max_distance = self.__positions()[:, 2].max(initial=0.0)*radius_multiplier
+        for point_idx, pos_idx in self.__window_pairs(xs, max_distance*(1 + 1e-9)):
+            pos = self.__positions()[pos_idx]
+            distance = pos[:, 2]*radius_multiplier
+            gaps = np.hypot(pos[:, 0]-xs[point_idx], pos[:, 1]-ys[point_idx])
+            near = gaps < distance
+
+            #! hypot() and dist() can round differently --> the pairs right at the distance are checked with dist()
+            for n in np.flatnonzero( np.abs(gaps-distance) <= 1e-12*distance ):
+                near[n] = dist( (pos[n, 0], pos[n, 1]), (xs[point_idx[n]], ys[point_idx[n]]) ) < distance[n]
+
+            # ignoring itself as a count
+            near &= ~( (pos[:, 0] == xs[point_idx]) & (pos[:, 1] == ys[point_idx]) )
+            counts += np.bincount(point_idx[near], minlength=len(xs))
+
+        #if there are 2 or less particles (including itself) in the area, it's just set to 1
+        counts[counts < 3] = 1
+
+        return counts
+
+    def __positions(self) -> np.ndarray:
+        return np.asarray(self.particle_positions, dtype=float).reshape(-1, 3)
+
+    def __window_pairs(self, xs: np.ndarray, half_width: float, max_pairs: int = 1 << 21):
+        """
+        Method to go through the (particle, profile particle) index pairs that are within `half_width` in x \
+            of each other (in chunks of about `max_pairs` pairs)
+        """
+        positions = self.__positions()
+        order = np.argsort(positions[:, 0], kind='stable')
+        sorted_xs = positions[order, 0]
+
+        lower = np.searchsorted(sorted_xs, xs-half_width, side='left')
+        sizes = np.searchsorted(sorted_xs, xs+half_width, side='right') - lower
+
+        start = 0
+        ends = np.cumsum(sizes)
+        while start < len(xs):
+            stop = max( int(np.searchsorted(ends, ends[start]-sizes[start]+max_pairs, side='right')), start+1 )
+            chunk_sizes = sizes[start:stop]
+            offsets = np.repeat(np.cumsum(chunk_sizes)-chunk_sizes, chunk_sizes)
+
+            point_idx = np.repeat(np.arange(start, stop), chunk_sizes)
+            pos_idx = order[ np.repeat(lower[start:stop], chunk_sizes) + np.arange(len(point_idx))-offsets ]
+            yield point_idx, pos_idx
+
+            start = stop
+
     #todo   The julia functions would go in here. The arrays would be passed in, and return values would be
     #todo   received in the form of arrays..?
@@ -0,0 +1,238 @@
+# drawing the particle bed. The particles are either
+#     - in one collection that is built once, and only its offsets, sizes and colors are swapped for every frame
+#     - or drawn straight into an image with numpy (much faster for large beds, redrawn when the view changes)
+# instead of scattering the whole bed again.
+import numpy as np
+from matplotlib.lines import Line2D
+from matplotlib.colors import to_rgba
+
+#* scatter plot radius scaling
+R_SCALE = 25000
+
+# colors of the particles
+BED_COLOR = 'w'
+SURFACE_COLOR = 'cyan'
+CONTACT_COLOR = 'magenta'
+DISC_COLOR = 'orange'
+
+def rasterize_disks(
+    positions: np.ndarray,
+    radii_px: np.ndarray,
+    color_ids: np.ndarray,
+    palette: np.ndarray,
+    size: tuple[int, int],
+    extent: tuple[float, float, float, float],
+    edge_px: int = 1,
+    edgecolor: tuple = (0.0, 0.0, 0.0, 1.0),
+    ) -> np.ndarray:
+    """
+    Function to draw filled disks with an outline into an RGBA image. Disks later in the arrays are drawn on top.
+        - Args
+            - `positions` : (N x 2) array of the disk centers (data coordinates)
+            - `radii_px` : the radius of each disk (pixels)
+            - `color_ids` : the index of the fill color of each disk in `palette`
+            - `palette` : (C x 4) array of the RGBA fill colors
+            - `size` : the (width, height) of the image in pixels
+            - `extent` : the (left, right, bottom, top) of the image in data coordinates
+            - `edge_px` : the outline width in pixels
+        - Returns
+            - (height x width x 4) image (transparent where there are no disks, first row at the top)
+    """
+    width, height = size
+    left, right, bottom, top = extent
+    if len(positions) == 0:
+        return np.zeros((height, width, 4))
+
+    cols = np.rint( (positions[:, 0]-left)/(right-left)*width ).astype(int)
+    rows = np.rint( (top-positions[:, 1])/(top-bottom)*height ).astype(int)
+    radii = np.maximum(np.rint(radii_px).astype(int), 1)
+
+    #* the disks are stamped as indices into the palette (with the outline and empty colors added)
+    color_ids = np.asarray(color_ids)
+    edge_id, empty_id = len(palette), len(palette)+1
+    palette = np.vstack( (palette, edgecolor, (0.0, 0.0, 0.0, 0.0)) )
+
+    labels = np.full((height, width), empty_id, dtype=np.int32)
+
+    #* stamping all the disks of the same (pixel) radius at once
+    for radius in np.unique(radii):
+        which = np.flatnonzero(radii == radius)
+
+        dy, dx = np.mgrid[-radius:radius+1, -radius:radius+1]
+        dist2 = dx**2 + dy**2
+        inside = dist2 <= radius**2
+        dy, dx = dy[inside], dx[inside]
+        is_edge = dist2[inside] > (radius-edge_px)**2
+
+        stamp_rows = (rows[which, None] + dy).ravel()
+        stamp_cols = (cols[which, None] + dx).ravel()
+        stamp_ids = np.where(is_edge, edge_id, color_ids[which, None]).ravel()
+
+        valid = (stamp_rows >= 0) & (stamp_rows < height) & (stamp_cols >= 0) & (stamp_cols < width)
+        labels[stamp_rows[valid], stamp_cols[valid]] = stamp_ids[valid]
+
+    return palette[labels]
+
+class BedRenderer:
+    """
+    Class to draw the particle bed, the surface, the contact particles, the disc and the crater/mound onto an axis
+
+    - Args:
+        - `ax` : the axis to draw on
+        - `box_width` : the width of the simulation box (for the x limits)
+        - `ylim` : the y limits of the axis
+        - `r_scale` : the scatter plot radius scaling
+        - `rasterized` : draw the particles as an image when saving to a vector format
+        - `raster` : draw the particles into an image with numpy instead of using a collection
+    """
+
+    # the outline width of the particles (points)
+    LINEWIDTH = 0.5
+
+    # the colors of the bed, surface and contact particles
+    PALETTE = np.array([ to_rgba(color) for color in (BED_COLOR, SURFACE_COLOR, CONTACT_COLOR) ])
+
+    def __init__(self, ax, box_width: float, ylim: tuple[float, float] = (0.13, 0.25), r_scale: float = R_SCALE, rasterized: bool = False, raster: bool = False) -> None:
+        self.ax = ax
+        self.r_scale = r_scale
+        self.raster = raster
+
+        ax.set_facecolor("white")
+
+        #* the particles (bed, surface and contacts are just different colors)
+        self.particles = ax.scatter(
+            [], [],
+            c = BED_COLOR,
+            edgecolors = 'k',
+            linewidth = self.LINEWIDTH,
+            rasterized = rasterized,
+        )
+
+        #* the particles drawn as an image (redrawn whenever the view changes)
+        self.image = ax.imshow(
+            np.zeros((1, 1, 4)),
+            extent = (0, 1, 0, 1),
+            aspect = 'auto',
+            interpolation = 'nearest',
+            visible = raster,
+        )
+        self.__last = None
+        if raster:
+            ax.callbacks.connect('xlim_changed', self.__redraw_image)
+            ax.callbacks.connect('ylim_changed', self.__redraw_image)
+            ax.figure.canvas.mpl_connect('resize_event', self.__redraw_image)
+
+        #* the disc (on top of the particles)
+        self.disc = ax.scatter(
+            [], [],
+            c = DISC_COLOR,
+            edgecolors = 'k',
+            linewidth = 1.0,
+            zorder = 3,
+        )
+
+        # crater/mound arrows
+        self.crater_note = ax.annotate(
+            "", xy = (0, 0), xycoords = "data",
+            xytext = (0, 0), textcoords = "data",
+            arrowprops = dict( arrowstyle = "->" )
+        )
+        self.mound_note = ax.annotate(
+            "", xy = (0, 0), xycoords = "data",
+            xytext = (0, 0), textcoords = "data",
+            arrowprops = dict( arrowstyle = "->" )
+        )
+
+        # legend entries
+        self.surface_handle = Line2D(
+            [], [], linestyle = '', marker = 'o', markerfacecolor = SURFACE_COLOR, markeredgecolor = 'k', label = "Surface"
+        )
+        self.contact_handle = Line2D(
+            [], [], linestyle = '', marker = 'o', markerfacecolor = CONTACT_COLOR, markeredgecolor = 'k', label = "Contact Particles"
+        )
+        self.points_handle = Line2D([], [], linestyle = '')
+
+        ax.set_ylim(ylim)
+        ax.set_xlim( (-0.01, box_width) )
+
+    def draw(self, frame: dict) -> list:
+        """
+        Method to draw a single frame
+            - Args:
+                - `frame` : dictionary with the reduced `bed` (`_Bed` object), the `disc` data, \
+                    and the `crater`, `mound` and `contacts` (see `tsVisualize.VisualSession.get()`)
+            - Returns:
+                - the artists that changed
+        """
+        bed = frame['bed']
+        bedDict = bed.get_input()
+        pIDs = list(bedDict)
+        index = { pID: i for i, pID in enumerate(pIDs) }
+
+        positions = np.array([ (bedDict[pID]['x'], bedDict[pID]['y']) for pID in pIDs ]).reshape(-1, 2)
+        radii = np.array([ bedDict[pID]['r'] for pID in pIDs ])
+
+        # the color of each particle as an index into PALETTE
+        color_ids = np.zeros(len(pIDs), dtype=int)
+        color_ids[[ index[pID] for pID in bed.surface if pID in index ]] = 1
+
+        contacts = [ index[pID] for pID in frame['contacts'] if pID in index ]
+        color_ids[contacts] = 2
+
+        if self.raster:
+            self.__last = (positions, radii, color_ids)
+            self.__redraw_image()
+        else:
+            self.particles.set_offsets(positions)
+            self.particles.set_sizes(radii*self.r_scale)
+            self.particles.set_facecolors(self.PALETTE[color_ids])
+
+        #* the disc
+        disc = frame['disc']
+        self.disc.set_offsets([ (disc['disc_xs'], disc['disc_ys']) ])
+        self.disc.set_sizes([ disc['disc_rs']*self.r_scale*7 ])
+
+        #* the crater/mound can only be tracked after the disc is in contact with the bed
+        handles = [self.surface_handle]
+        has_contacts = len(contacts) != 0
+        self.crater_note.set_visible(has_contacts)
+        self.mound_note.set_visible(has_contacts)
+        if has_contacts:
+            (crater_x, crater_y), (mound_x, mound_y) = frame['crater'], frame['mound']
+
+            self.crater_note.set_text(f"Crater\n({crater_x:.4f},{crater_y:.4f})")
+            self.crater_note.xy = (crater_x, crater_y)
+            self.crater_note.set_position( (crater_x-0.05, crater_y+0.03) )
+
+            self.mound_note.set_text(f"Mound\n({mound_x:.4f},{mound_y:.4f})")
+            self.mound_note.xy = (mound_x, mound_y)
+            self.mound_note.set_position( (mound_x-0.03, mound_y+0.01) )
+
+            self.points_handle.set_label(f"Crater: ({crater_x:.4f},{crater_y:.4f})\nMound: ({mound_x:.4f},{mound_y:.4f})")
+            handles += [self.contact_handle, self.points_handle]
+
+        legend = self.ax.legend(handles = handles)
+
+        return [self.image if self.raster else self.particles, self.disc, self.crater_note, self.mound_note, legend]
+
+    def __redraw_image(self, *_) -> None:
+        #* drawing the particles of the last frame at the current view and size of the axis
+        if self.__last is None:
+            return
+        positions, radii, color_ids = self.__last
+
+        bbox = self.ax.get_window_extent()
+        (left, right), (bottom, top) = self.ax.get_xlim(), self.ax.get_ylim()
+        px_per_pt = self.ax.figure.dpi/72
+
+        self.image.set_data(rasterize_disks(
+            positions,
+            # same size as the scatter markers (the marker size is an area in points^2)
+            np.sqrt(radii*self.r_scale)/2*px_per_pt,
+            color_ids,
+            self.PALETTE,
+            ( max(int(bbox.width), 1), max(int(bbox.height), 1) ),
+            (left, right, bottom, top),
+            edge_px = max(int(round(self.LINEWIDTH*px_per_pt)), 1),
+        ))
+        self.image.set_extent((left, right, bottom, top))
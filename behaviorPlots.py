@@ -2,11 +2,12 @@ import sys
 import json
 import numpy as np
 import seaborn as sns
-import openpyxl as pxl
 import matplotlib.pyplot as plt
 from matplotlib.colors import LinearSegmentedColormap
 
 from pathExtract import TASK_ID, TRIAL_ID
+from sweep_grid import ANGLES, VELOCITIES, SweepGrid
+from label_store import load_human_labels
 
 try:
     TASK_ID = sys.argv[1]
@@ -18,61 +19,24 @@ except IndexError:
     pass
 
 
-def processData(data_dict: dict) -> list[list[int]]:
+def processData(data_dict: dict) -> np.ndarray | tuple[np.ndarray, np.ndarray]:
     """
     Function to process the input dictionaries to a 2D list for plotting
         - Args
             - `data_dict`: dictionary of behaviors (and confidence)
         - Returns
-        - 2-D array for the matshow plot
+        - 2-D array for the matshow plot (and the 2-D array of the confidence)
     """
-    
+    grid = SweepGrid(data_dict)
+
     # for the normal dictionary 
     if type(next(iter(data_dict.values()))) == str: 
         # this way the data type of the computer output can be anything other than "str"
-        behaviorsList = []
-        for angle in np.linspace(20, 70, 11, dtype=int):
-            behaviorList_I = []
-            for velocity in np.linspace(1.0, 7.0, 13):
-
-                if data_dict[f"V{velocity}_A{angle}"] == "FS":
-                    behaviorList_I.append(0)
-                if data_dict[f"V{velocity}_A{angle}"] == "RO":
-                    behaviorList_I.append(1)
-                if data_dict[f"V{velocity}_A{angle}"] == "RC":
-                    behaviorList_I.append(2)
-
-            behaviorsList.append(behaviorList_I)
-
-        return behaviorsList
+        return grid.codes()
     
     # extracting the confidence values 
-    #todo the loaded data is now a key-value thing so the indexing should change
     else:
-        behaviorsList = []
-        confidenceList = []
-        for angle in np.linspace(20, 70, 11, dtype=int):
-            # initializing each row 
-            behaviorList_I = []
-            confidenceList_I = []
-            for velocity in np.linspace(1.0, 7.0, 13):
-
-                # adding the confidence
-                confidenceList_I.append(data_dict[f"V{velocity}_A{angle}"]['confidence'])
-
-                if data_dict[f"V{velocity}_A{angle}"]['behavior'] == "FS":
-                    behaviorList_I.append(0)
-
-                if data_dict[f"V{velocity}_A{angle}"]['behavior'] == "RO":
-                    behaviorList_I.append(1)
-                    
-                if data_dict[f"V{velocity}_A{angle}"]['behavior'] == "RC":
-                    behaviorList_I.append(2)
-
-            behaviorsList.append(behaviorList_I)
-            confidenceList.append(confidenceList_I)
-
-        return behaviorsList, confidenceList 
+        return grid.codes('behavior'), grid['confidence']
         
 
 
@@ -82,21 +46,8 @@ def main():
         compDict = json.load(readC)
 
     # the human dictionary is probably not sorted
-    try:
-        with open(f"behaviors/human/Human_Behavior_{TASK_ID}.json", 'r') as file:
-            humanDict = json.load(file)
-    
-    # if there is no json file to refer to, go to the old xlsx file
-    except FileNotFoundError:
-        wb_file = pxl.load_workbook(f"behaviors/human/{TASK_ID}_batchManager.xlsx") #only need relative path
-        sheet = wb_file.active
-        MAXROW = sheet.max_row
-        humanDict = {}
-        for i in range(2, MAXROW+1):
-            iterations_H = sheet.cell(row = i, column = 1).value
-            behavior_H = sheet.cell(row = i, column = 4).value
-
-            humanDict[iterations_H] = behavior_H
+    # (falls back to the cached labels of the batch manager workbook)
+    humanDict = load_human_labels(TASK_ID)
     
     #finding the unmatching keys
     unmatching = []
@@ -105,17 +56,14 @@ def main():
             unmatching.append(key)
 
     #extracting x and y axes from the humanDict dictionary
-    y_axis = list(np.linspace(20, 70, 11, dtype=int)) # angle
-    x_axis = list(np.linspace(1.0, 7.0, 13)) # vel
+    y_axis = list(ANGLES) # angle
+    x_axis = list(VELOCITIES) # vel
     
     total_iter = len(x_axis)*len(y_axis)
 
     #calling the function on the dictionaries
-    humanBehavior = np.array(processData(humanDict))
-    comp_decision = processData(compDict)
-    
-    compBehavior = np.array(comp_decision[0])
-    confidence = np.array(comp_decision[1])
+    humanBehavior = processData(humanDict)
+    compBehavior, confidence = processData(compDict)
 
     # diffBehavior = np.logical_xor(humanBehavior, compBehavior)
     diffBehavior = humanBehavior != compBehavior
@@ -0,0 +1,129 @@
+# tracking the particles in contact with the disc over an iteration. The contacts of each frame are found with
+#     a vectorized query around the disc, and every particle keeps a list of (start, end) intervals instead of
+#     the contacts of every frame.
+#     - The intervals are in frame indices (inclusive) while tracking, and can be converted to timesteps at the end
+#     - A contact only covers the analyzed frames. The frames skipped in between (with sparse sampling) are not
+#         counted, so a contact seen at two analyzed frames with a gap between them is two intervals
+import numpy as np
+
+#* the contact radius as a multiple of the disc radius
+#* (the ratio of the disc R to the single particle R + disc R) * 110%
+CONTACT_RATIO = (1197+8075)/8075*1.1
+
+def query_contacts(bedDict: dict, center: tuple[float, float], radius: float) -> list[int]:
+    """
+    Function to get the particles whose centers are within `radius` of `center`
+        - Args
+            - `bedDict` : the particle dictionary of a frame ({pID: {x, y, r}})
+            - `center` : the (x, y) center of the query
+            - `radius` : the radius of the query
+        - Returns
+            - the particle IDs (in the order of `bedDict`)
+    """
+    if len(bedDict) == 0:
+        return []
+
+    pIDs = np.fromiter(bedDict.keys(), dtype=int, count=len(bedDict))
+    positions = np.array([ (v['x'], v['y']) for v in bedDict.values() ])
+
+    # only the particles in the bounding box of the circle are measured
+    center_x, center_y = center
+    near = np.flatnonzero(
+        (np.abs(positions[:, 0]-center_x) < radius) & (np.abs(positions[:, 1]-center_y) < radius)
+    )
+    within = np.hypot(positions[near, 0]-center_x, positions[near, 1]-center_y) < radius
+
+    return pIDs[near[within]].tolist()
+
+
+class ContactTracker:
+    """
+    Class to keep the contact intervals of each particle as the (analyzed) frames come in
+
+    - Attributes:
+        - `intervals` : dictionary of {pID : [(start, end), ...]} of the closed intervals (frame indices, inclusive)
+    """
+
+    def __init__(self) -> None:
+        self.intervals = {}
+
+        # the particles in contact at the last frame, with the start of their contact
+        self.__open = {}
+
+        #* the last analyzed frame (None before the first update)
+        self.last = None
+
+    def update(self, idx: int, contacts: list[int]) -> None:
+        """
+        Method to add the contacts of an analyzed frame (in increasing order of `idx`)
+        """
+        contacts = set(contacts)
+
+        # every contact ends at the last analyzed frame if frames were skipped since then
+        skipped = self.last is not None and idx > self.last+1
+        for pID in [ pID for pID in self.__open if skipped or pID not in contacts ]:
+            self.intervals.setdefault(pID, []).append( (self.__open.pop(pID), self.last) )
+
+        for pID in contacts:
+            self.__open.setdefault(pID, idx)
+        self.last = idx
+
+    def finish(self, end: int = None) -> None:
+        """
+        Method to close the contacts still open at frame `end` (the last analyzed frame if not given)
+        """
+        if end is None:
+            end = self.last
+        for pID, start in self.__open.items():
+            self.intervals.setdefault(pID, []).append( (start, end) )
+        self.__open = {}
+
+    def get_intervals(self, end: int = None) -> dict:
+        """
+        Method to get the intervals of every particle, with the open contacts held until `end` \
+            (left out if `end` is None)
+        """
+        intervals = { pID: list(spans) for pID, spans in self.intervals.items() }
+        if end is not None:
+            for pID, start in self.__open.items():
+                intervals.setdefault(pID, []).append( (start, end) )
+
+        return intervals
+
+    def __spans(self, end: int = None) -> np.ndarray:
+        spans = [ span for spans in self.get_intervals(end).values() for span in spans ]
+        return np.array(spans, dtype=int).reshape(-1, 2)
+
+    def counts(self, num_frames: int, end: int = None) -> np.ndarray:
+        """
+        Method to get the number of particles in contact at every frame
+            - Args
+                - `num_frames` : the number of frames of the iteration
+                - `end` : the frame the open contacts are held until (left out if None)
+        """
+        spans = self.__spans(end)
+
+        changes = np.zeros(num_frames+1, dtype=int)
+        np.add.at(changes, spans[:, 0], 1)
+        np.add.at(changes, spans[:, 1]+1, -1)
+
+        return np.cumsum(changes[:-1])
+
+    def durations(self, end: int = None) -> dict:
+        """
+        Method to get the total number of frames each particle is in contact for
+        """
+        return {
+            pID: sum( stop-start+1 for start, stop in spans ) for pID, spans in self.get_intervals(end).items()
+        }
+
+    def to_timesteps(self, timesteps: list[int], end: int = None) -> dict:
+        """
+        Method to get the intervals of every particle in timesteps (json serializable)
+            - Args
+                - `timesteps` : the timestep of each frame index
+        """
+        return {
+            str(pID): [ [int(timesteps[start]), int(timesteps[stop])] for start, stop in spans ]
+            for pID, spans in self.get_intervals(end).items()
+        }
@@ -0,0 +1,188 @@
+# exporting the bed of an iteration as a sequence of images (and a video)
+import os
+import sys
+import glob
+import shutil
+import subprocess
+import numpy as np
+import concurrent.futures
+from time import perf_counter
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import bed_analysis
+from bed_render import BedRenderer
+from pathExtract import TASK_ID, analyze_bed, get_path, get_init_products, BED_CUTOFF
+
+try:
+    TASK_ID = sys.argv[1]
+except IndexError:
+    pass
+
+# angle and velocity
+try:
+    angle = int(sys.argv[2])
+except IndexError:
+    angle = 20
+try:
+    velocity = float(sys.argv[3])
+except IndexError:
+    velocity = 1.0
+
+#* exporting every n-th frame (1 --> every frame)
+try:
+    EVERY = int(sys.argv[4])
+except IndexError:
+    EVERY = 1
+
+#* frames per second of the video (only made if ffmpeg is installed)
+FPS = 10
+
+def render_frames(bed_filepath: str, disc_filepath: str, reduc_idx: list[int], frames: list[tuple[int, int]], out_dir: str, title: str) -> list[str]:
+    """
+    Function to render a (contiguous) chunk of frames to numbered images. Runs in the worker processes, \
+        so the figure is built once per chunk and only the data is swapped for every frame.
+        The images are saved as `render_#####.png` and numbered without gaps by `export_frames()` afterwards.
+        - Args
+            - `bed_filepath`, `disc_filepath` : the dump files of the iteration
+            - `reduc_idx` : the IDs of the particles in the reduced bed
+            - `frames` : the (frame number, timestep) of each frame to render (the timesteps without a bed frame are skipped)
+            - `out_dir` : the directory to save the images to
+            - `title` : the title of the figure
+        - Returns
+            - the paths of the saved images
+    """
+    Disc = bed_analysis.DiscFile(disc_filepath)
+
+    fig = Figure(figsize = (15,6))
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    fig.suptitle(title, fontsize = 20, fontweight = "bold")
+    renderer = BedRenderer(ax, Disc.box_width, raster=True)
+
+    numbers = dict( (timestep, number) for number, timestep in frames )
+    reader = bed_analysis.FrameReader(bed_filepath, list(numbers))
+
+    paths = []
+    for timestep, bedDict in reader.frames(bed_analysis.ParticleFilter(ids=reduc_idx)):
+        discDatas = Disc.dataDict[timestep]
+
+        particle_bed = bed_analysis._Bed(bedDict)
+        crater, mound, touch_idx = analyze_bed(
+            particle_bed,
+            ( discDatas['disc_xs'], discDatas['disc_ys'], discDatas['disc_rs'] )
+        )
+
+        ax.set_title(f"(timestep: {timestep})")
+        renderer.draw({
+            'bed' : particle_bed,
+            'disc' : discDatas,
+            'crater' : crater,
+            'mound' : mound,
+            'contacts' : touch_idx,
+        })
+
+        path = f"{out_dir}/render_{numbers[timestep]:05d}.png"
+        fig.savefig(path)
+        paths.append(path)
+
+    return paths
+
+def export_frames(bed_filepath: str, disc_filepath: str, out_dir: str, every: int = 1, title: str = "", workers: int = None) -> list[str]:
+    """
+    Function to render every `every`-th frame of an iteration to `out_dir/frame_#####.png` over a pool of workers. \
+        The images of an earlier export in `out_dir` are deleted first.
+        - Returns
+            - the paths of the saved images (in order, numbered from 0 without gaps)
+    """
+    Disc = bed_analysis.DiscFile(disc_filepath)
+
+    #* the reduced bed is found once and shared with the workers
+    initBed, _ = get_init_products(bed_filepath)
+    reduc_idx = initBed.is_greater('y', BED_CUTOFF)
+
+    frames = list(enumerate(Disc.ts[::every]))
+    if len(frames) == 0:
+        return []
+    os.makedirs(out_dir, exist_ok=True)
+
+    #* a shorter re-export would otherwise leave old frames at the end of the sequence for ffmpeg to pick up
+    for old_path in glob.glob(f"{out_dir}/frame_*.png") + glob.glob(f"{out_dir}/render_*.png"):
+        os.remove(old_path)
+
+    # contiguous chunks, so that each worker stops reading the dump file after its last frame
+    #! every worker still scans the file from the start (skipping the frames before its chunk without parsing them),
+    #! so the total reading is up to (workers x file) while the parsing and drawing are split between them
+    workers = workers or os.cpu_count() or 1
+    chunks = [ chunk.tolist() for chunk in np.array_split(np.array(frames), min(workers, len(frames))) ]
+
+    paths = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            render_frames,
+            [bed_filepath]*len(chunks),
+            [disc_filepath]*len(chunks),
+            [reduc_idx]*len(chunks),
+            chunks,
+            [out_dir]*len(chunks),
+            [title]*len(chunks),
+        )
+        for chunk_paths in results:
+            paths.extend(chunk_paths)
+
+    #* numbering what was actually rendered, ffmpeg stops at the first gap in the sequence
+    frame_paths = []
+    for number, path in enumerate(paths):
+        frame_path = f"{out_dir}/frame_{number:05d}.png"
+        os.replace(path, frame_path)
+        frame_paths.append(frame_path)
+
+    return frame_paths
+
+def make_video(out_dir: str, video_path: str, fps: int = FPS) -> bool:
+    """
+    Function to put the frames together into a video with ffmpeg (skipped if ffmpeg is not installed)
+        - Returns
+            - whether or not the video was made
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        print("ffmpeg not found, only the frames were saved")
+        return False
+
+    subprocess.run(
+        [
+            ffmpeg, "-y", "-loglevel", "error",
+            "-framerate", str(fps),
+            "-i", f"{out_dir}/frame_%05d.png",
+            # the encoder needs an even width and height
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-pix_fmt", "yuv420p",
+            video_path,
+        ],
+        check = True,
+    )
+    return True
+
+def main():
+    iteration = f"V{velocity}_A{angle}"
+    out_dir = f"output_plots/frames/frames_{TASK_ID}_{iteration}"
+
+    paths = export_frames(
+        get_path("bed", angle, velocity),
+        get_path("disc", angle, velocity),
+        out_dir,
+        EVERY,
+        title = f"{TASK_ID}: V = {velocity}, A = {angle}",
+    )
+    print(f"Saved {len(paths)} frames to {out_dir}")
+
+    if make_video(out_dir, f"{out_dir}.mp4"):
+        print(f"Saved the video to {out_dir}.mp4")
+
+if __name__ == "__main__":
+    start = perf_counter()
+    main()
+    end = perf_counter()
+
+    print(f"Total runtime: { int( (end-start)//60 ) }:{(end-start)%60 : .2f}")
@@ -2,12 +2,13 @@ import os
 import sys
 import json
 import logging
-import numpy as np
-import openpyxl as pxl
+import concurrent.futures
 from time import perf_counter
 
 from post_processing import Comparer, Visualizer
 from pathExtract import TASK_ID, TRIAL_ID
+from sweep_grid import SweepGrid
+from label_store import load_human_labels
 #todo   Implement task ID and trial ID to differentiate between tasks and such
 
 try:
@@ -19,68 +20,78 @@ try:
 except IndexError:
     pass
 
+#* lighter path plots for reviewing a whole sweep (None/False for the full resolution)
+PLOT_MAX_POINTS = None
+PLOT_RASTERIZE = False
+
+def classify_and_plot(path: str, human_decision: str, save_path: str):
+    """
+    Function to classify a single iteration and save its path plots (run in the worker processes)
+        - Returns
+            - the `_DecisionPackage` of the iteration (without the time series)
+    """
+    #* creating an output object that holds the necessary data
+    output = Comparer(path, human_decision)
+
+    #* plotting the output behavior and saving the figure
+    plotter = Visualizer(output.behavior_obj)
+    plotter.path_plots(save_path, "svg", PLOT_MAX_POINTS, PLOT_RASTERIZE)
+
+    return output.behavior_obj
+
 def main():
     # loading the json file with human decisions for comparison
     # with open(f"behaviors/human/Human_Behavior_{TASK_ID}.json", 'r') as file:
     #     humanDict = json.load(file)
 
-    try:
-        with open(f"behaviors/human/Human_Behavior_{TASK_ID}.json", 'r') as file:
-            humanDict = json.load(file)
-
-    except FileNotFoundError:
-        wb_file = pxl.load_workbook(f"behaviors/human/{TASK_ID}_batchManager.xlsx") #only need relative path
-        sheet = wb_file.active
-        MAXROW = sheet.max_row
-        humanDict = {}
-        for i in range(2, MAXROW+1):
-            iterations_H = sheet.cell(row = i, column = 1).value
-            behavior_H = sheet.cell(row = i, column = 4).value
-
-            humanDict[iterations_H] = behavior_H
+    # (falls back to the cached labels of the batch manager workbook)
+    humanDict = load_human_labels(TASK_ID)
 
     # dictionary to hold the computer behavior classifications
     compDict = {}
     unmatching = []
 
-    # vectors to loop angles -> velocities
-    velocities = np.linspace(1.0, 7.0, 13)
-    angles = np.linspace(20, 70, 11, dtype=int)
-    # velocities = [7.0]
-    # angles = [25]
+    # looping angles -> velocities
+    keys = SweepGrid().flat_keys
+    # keys = SweepGrid(angles=[25], velocities=[7.0]).flat_keys
+
+    save_path = f"output_plots/path_plots/path_plots_{TASK_ID}_{TRIAL_ID}"
+    os.makedirs(save_path, exist_ok=True)
 
-    for angle in angles:
-        for velocity in velocities:
-            # the path for the data extracts for the computer decision
-            path = f"data_Extracts/data_Extract_{TASK_ID}_{TRIAL_ID}/outputs_V{velocity}_A{angle}.json"
+    logging.basicConfig( 
+        level = logging.INFO, 
+        format = "  %(message)s", 
 
-            #* creating an output object that holds the necessary data
-            output = Comparer(path, humanDict[f"V{velocity}_A{angle}"])
-            human_dec = output.behavior_obj.human_decision
+        # outputting to both a log file and the stdout 
+        handlers = [logging.FileHandler(f"output_logs/extract_{TASK_ID}_{TRIAL_ID}.log"), logging.StreamHandler(sys.stdout)]
+    ) 
+
+    #* classifying and plotting the iterations in parallel (the results come back in order)
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        packages = executor.map(
+            classify_and_plot,
+            [ f"data_Extracts/data_Extract_{TASK_ID}_{TRIAL_ID}/outputs_{key}.json" for key in keys ],
+            [ humanDict[key] for key in keys ],
+            [save_path]*len(keys),
+        )
+
+        for key, package in zip(keys, packages):
+            human_dec = package.human_decision
 
             # information for conditionals and such all included for better analysis
             comp_dec = {
-                "behavior" : output.behavior_obj.computer_decision,
-                "confidence": output.behavior_obj.confidence,
-                "contact_pIDs": output.behavior_obj.contact_pIDs,
-                "airborne": output.behavior_obj.airborne,
-                "surpasses": output.behavior_obj.surpasses,
-                "crater_out": output.behavior_obj.crater_out
+                "behavior" : package.computer_decision,
+                "confidence": package.confidence,
+                "contact_pIDs": package.contact_pIDs,
+                "airborne": package.airborne,
+                "surpasses": package.surpasses,
+                "crater_out": package.crater_out
             }
-            
-            #* plotting the output behavior and saving the figure
-            plotter = Visualizer(output.behavior_obj)
-
-            save_path = f"output_plots/path_plots/path_plots_{TASK_ID}_{TRIAL_ID}"
-            os.makedirs(save_path, exist_ok=True)
-            
-            # plotting funciton
-            plotter.path_plots(save_path, "svg")
 
             #* saving the computer behavior
-            #todo Export <<output.behavior_obj.decision>> this here
+            #todo Export <<package.decision>> this here
             #! comp_dec is a tuple --> (behavior, confidence)
-            compDict[f"V{velocity}_A{angle}"] = comp_dec
+            compDict[key] = comp_dec
 
             
             #* printing the behavior output
@@ -89,22 +100,15 @@ def main():
             else:
                 # behavior_str = f"Computer / Human: [{comp_dec[0]}/{human_dec}]\tConfidence: [{comp_dec[1]}] <-- UNMATCHING" 
                 behavior_str = f"Computer / Human: [{ comp_dec['behavior'] }/{human_dec}]\tConfidence: [{comp_dec['confidence']}] <-- UNMATCHING" 
-                unmatching.append(f"V{velocity}_A{angle}") 
-
-            logging.basicConfig( 
-                level = logging.INFO, 
-                format = "  %(message)s", 
+                unmatching.append(key) 
 
-                # outputting to both a log file and the stdout 
-                handlers = [logging.FileHandler(f"output_logs/extract_{TASK_ID}_{TRIAL_ID}.log"), logging.StreamHandler(sys.stdout)]
-            ) 
-            logging.info(f"\n Iteration: {output.behavior_obj.iteration}\t{behavior_str}") 
+            logging.info(f"\n Iteration: {package.iteration}\t{behavior_str}") 
             # printing the reasons line by line 
-            for idx, reason in enumerate(output.behavior_obj.reasons): 
+            for idx, reason in enumerate(package.reasons): 
                 logging.info(f"\tReason {idx}: {reason}") 
 
             # outputting the final vote 
-            logging.info(f"\tVotes: {output.behavior_obj.decisionDict}")
+            logging.info(f"\tVotes: {package.decisionDict}")
                 
     logging.info(f"\nMatch rate: { ( len(humanDict)-len(unmatching) )/len(humanDict):.3f}")    
     logging.info(f"{len(unmatching)} unmatching parameters: {unmatching}")    
@@ -1,12 +1,17 @@
-from statistics import mean, median
+import os
 import sys
 import json
 import numpy as np
 import seaborn as sns
+import concurrent.futures
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 from pathExtract import TASK_ID, TRIAL_ID
+from sweep_grid import BEHAVIORS, SweepGrid
+from label_store import load_human_labels
 
 try:
     TASK_ID = sys.argv[1]
@@ -17,12 +22,29 @@ try:
 except IndexError:
     pass
 
-# setting data to plot as a command line argument
+# setting data to plot as a command line argument ("all" --> every metric is saved to a file)
 try:
     PLOT_DATA = sys.argv[3]
 except IndexError:
     PLOT_DATA = "contact_pIDs"
 
+# titles of the metric plots (the metric name is used for the others)
+METRIC_TITLES = {
+    'contact_pIDs' : "Unique Contact Particles",
+    'airborne' : "Airborne Duration",
+    'surpasses' : "Surpasses",
+    'crater_out' : "Crater Out",
+    'confidence' : "Confidence",
+}
+
+# custom colormap defs
+myColors = (
+    (199/255,45/255,34/255,1.0), 
+    (224/255,227/255,34/255,1.0), 
+    (64/255,133/255,27/255,1.0)
+)
+colors = LinearSegmentedColormap.from_list('Custom', myColors, len(myColors))
+
 
 """
 Script to plot heatmap-style plots for the output datas.
@@ -33,125 +55,100 @@ Script to plot heatmap-style plots for the output datas.
         4. crater_out T/F
     - The plot also has the behaviors explicitly labeled as text on the thing
     - color is magnitude or T/F
+    - With "all" as the metric, every numeric/boolean metric is saved to its own file (in parallel), \
+        along with the per-behavior summaries of each metric
 """
 
-def processHuman(data_dict: dict) -> list[list[int]]:
+def processHuman(data_dict: dict) -> np.ndarray:
     """
-    Function to process the input dictionaries to a 2D list for plotting
+    Function to process the input dictionaries to a 2D array for plotting
         - Args
             - `data_dict`: dictionary of behaviors (and confidence)
         - Returns
         - 2-D array for the matshow plot
     """
+    return SweepGrid(data_dict).codes()
 
-    # for the normal dictionary 
-    # this way the data type of the computer output can be anything other than "str"
-    behaviorsList = []
-    for angle in np.linspace(20, 70, 11, dtype=int):
-        behaviorList_I = []
-        for velocity in np.linspace(1.0, 7.0, 13):
-
-            if data_dict[f"V{velocity}_A{angle}"] == "FS":
-                behaviorList_I.append(0)
-            if data_dict[f"V{velocity}_A{angle}"] == "RO":
-                behaviorList_I.append(1)
-            if data_dict[f"V{velocity}_A{angle}"] == "RC":
-                behaviorList_I.append(2)
-
-        behaviorsList.append(behaviorList_I)
-
-    return behaviorsList
-
-def processData(input_dict: dict, parameter: str) -> list[list[int]]:
+def processData(input_dict: dict, parameter: str) -> np.ndarray:
     """
-    Function to process the data into lists
+    Function to process the data into arrays
         - Args:
             - `input_dict` : input dictionary with values of interest
             - `parameter` : the parameter in the dicitonary to focus on
         - Returns:
-            - A 2-D list of the values within the dictionary
+            - A 2-D array of the values within the dictionary
     """
+    return SweepGrid(input_dict)[parameter]
 
-    return [
-        [input_dict[f"V{velocity}_A{angle}"][parameter] for velocity in np.linspace(1.0, 7.0, 13) ] for angle in np.linspace(20, 70, 11, dtype=int)
-    ]
-
-def main():
+def get_metrics(compDict: dict) -> list[str]:
+    """
+    Function to get the numeric and boolean metrics of the decision records
+    """
+    record = next(iter(compDict.values()))
+    return [ key for key, value in record.items() if isinstance(value, (bool, int, float)) ]
 
-    # loading the data in a dictionary
-    with open(f"behaviors/computer/Computer_Behavior_{TASK_ID}_{TRIAL_ID}.json", 'r') as file:
-        compDict = json.load(file)
+def summarize(values: np.ndarray, codes: np.ndarray) -> dict:
+    """
+    Function to get the min/max/mean/median of a metric for each behavior
+        - Args
+            - `values` : 2-D array of the metric
+            - `codes` : 2-D array of the behaviors (FS -> 0, RO -> 1, RC -> 2)
+        - Returns
+            - dictionary of {behavior : {min, max, mean, median}} (`None` for behaviors that never happen)
+    """
+    values = np.asarray(values, dtype=float)
 
-    #! temp human behavior open
-    with open(f"behaviors/human/Human_Behavior_{TASK_ID}.json", 'r') as file:
-        humanDict = json.load(file)
+    summary = {}
+    for code, behavior in enumerate(BEHAVIORS):
+        picked = values[codes == code]
+        if len(picked) == 0:
+            summary[behavior] = None
+            continue
 
-    humanData = processHuman(humanDict)
+        summary[behavior] = {
+            'min' : float(picked.min()),
+            'max' : float(picked.max()),
+            'mean' : float(picked.mean()),
+            'median' : float(np.median(picked)),
+        }
 
-    # keys = [ key for key in next(iter(compDict.values())) if (key != "confidence") and (key != "behavior")]
-    keys = [ key for key in next(iter(compDict.values())) if (key != "confidence") ]
-
-    # a dictionary of 2d lists for the heatmap
-    datas = {key: processData(compDict, key) for key in keys}
-
-    # conversion key
-    conversion = {
-        'FS': 0,
-        'RO': 1,
-        'RC': 2
-    }
-
-    # a list to convert the strings into the corresponding integers
-    compData = [
-        [conversion[that] for that in line] for line in datas['behavior']
-    ]
-
-    #* finding the average contact particles for FS, RO, RC
-    fss, ros, rcs = [],[],[]
-    for i, line in enumerate(datas["behavior"]):
-        for j, thing in enumerate(line):
-            if thing == 'FS':
-                fss.append(datas["contact_pIDs"][i][j])
-            if thing == 'RO':
-                ros.append(datas["contact_pIDs"][i][j])
-            if thing == 'RC':
-                rcs.append(datas["contact_pIDs"][i][j])
+    return summary
 
+def print_summary(metric: str, summary: dict) -> None:
     # examining the maximum and minimum values
-    print(f"[{TASK_ID}] - Unique Disc Contact Particles")
-    print(f"FSs: min/max = {min(fss)}/{max(fss)}\tmean/median = {mean(fss):.2f}/{(median(fss))}")
-    print(f"ROs: min/max = {min(ros)}/{max(ros)}\tmean/median = {mean(ros):.2f}/{(median(ros))}")
-    print(f"RCs: min/max = {min(rcs)}/{max(rcs)}\tmean/median = {mean(rcs):.2f}/{(median(rcs))}")
-
-    #* plotting
-    fig, ((ax2, ax3),(ax1, ax4)) = plt.subplots(2,2, figsize=(10,9))
+    print(f"[{TASK_ID}] - {METRIC_TITLES.get(metric, metric)}")
+    for behavior, stats in summary.items():
+        if stats is None:
+            print(f"{behavior}s: none")
+            continue
+        print(f"{behavior}s: min/max = {stats['min']:g}/{stats['max']:g}\tmean/median = {stats['mean']:.2f}/{stats['median']:g}")
+
+def plot_metric(fig, metric: str, values: np.ndarray, behaviors: np.ndarray, compData: np.ndarray, humanData: np.ndarray, y_axis: list, x_axis: list) -> None:
+    """
+    Function to draw the 2x2 comparison of a metric onto a figure
+        - Args
+            - `fig` : the figure to draw on
+            - `metric` : the name of the metric
+            - `values` : 2-D array of the metric
+            - `behaviors` : 2-D array of the computer behavior labels (annotations)
+            - `compData`, `humanData` : 2-D arrays of the computer/human behaviors (FS -> 0, RO -> 1, RC -> 2)
+            - `y_axis`, `x_axis` : the angles and velocities
+    """
+    (ax2, ax3),(ax1, ax4) = fig.subplots(2,2)
     fig.suptitle(f"{TASK_ID} Quantities Comparison", fontsize = 16, fontweight = "bold")
 
-    y_axis = list(np.linspace(20, 70, 11, dtype=int)) # angles
-    x_axis = list(np.linspace(1.0, 7.0, 13)) # velocities
+    title = METRIC_TITLES.get(metric, metric)
+    values = np.asarray(values, dtype=float)
 
-    # custom colormap defs
-    myColors = (
-        (199/255,45/255,34/255,1.0), 
-        (224/255,227/255,34/255,1.0), 
-        (64/255,133/255,27/255,1.0)
-    )
-    colors = LinearSegmentedColormap.from_list('Custom', myColors, len(myColors))
-    binColors = (
-        (0.8, 0.8, 0.8, 1),
-        (0,0,0,1)
-    )
-    BW = LinearSegmentedColormap.from_list("Custom", binColors, len(binColors))
-
-    # Particle Contact Length Heatmaps
-    ax1.set_title("Unique Contact Particles")
+    # metric heatmap with the behaviors
+    ax1.set_title(title)
     ax1 = sns.heatmap(
         ax = ax1,
-        data = datas[PLOT_DATA],
+        data = values,
         yticklabels = y_axis, 
         linewidths = 2, 
         cmap = "Blues",
-        annot = np.array(datas['behavior']), 
+        annot = behaviors, 
         fmt = ""
 
     )
@@ -159,13 +156,12 @@ def main():
     ax1.set_xticklabels(x_axis, rotation = 45)
     ax1.set_xlabel("Velocities")
     ax1.set_ylabel("Angles")
-    colorabar1 = ax1.collections[0].colorbar
 
-    # particle Contact Length with Annotation
-    ax4.set_title("Unique Contact Particles (Mag)")
+    # metric heatmap with the magnitudes
+    ax4.set_title(f"{title} (Mag)")
     ax4 = sns.heatmap(
         ax = ax4, 
-        data = datas[PLOT_DATA], 
+        data = values, 
         yticklabels = y_axis,
         linewidths = 2, 
         cmap = "Blues", 
@@ -175,7 +171,6 @@ def main():
     ax4.set_xticklabels(x_axis, rotation = 45)
     ax4.set_xlabel("Velocities")
     ax4.set_ylabel("Angles")
-    colorbar4 = ax4.collections[0].colorbar
     
     # Computer Behavior Plot
     ax2.set_title("Computer Plot")
@@ -217,8 +212,83 @@ def main():
     colorbar3.set_ticks([0.33,1.0,1.66])
     colorbar3.set_ticklabels(["FS","RO","RC"])
 
-    # plt.subplots_adjust(bottom=0.21)
-    plt.tight_layout()
+    fig.tight_layout()
+
+def render_metric(path: str, *args) -> str:
+    """
+    Function to save the plot of a metric to a file (the arguments after `path` are the same as `plot_metric()`). \
+        Runs in the worker processes, so it draws on its own figure instead of pyplot.
+    """
+    fig = Figure(figsize=(10,9))
+    FigureCanvasAgg(fig)
+    plot_metric(fig, *args)
+    fig.savefig(path, format = "svg")
+
+    return path
+
+def render_all(compDict: dict, humanDict: dict, save_path: str) -> dict:
+    """
+    Function to save the plots of every metric (in parallel) and summarize each metric per behavior
+        - Returns
+            - dictionary of {metric : per-behavior summary}
+    """
+    sweep = SweepGrid(compDict)
+    humanData = processHuman(humanDict)
+    compData = sweep.codes('behavior')
+    metrics = get_metrics(compDict)
+
+    os.makedirs(save_path, exist_ok=True)
+
+    summaries = {}
+    with concurrent.futures.ProcessPoolExecutor() as executor:
+        futures = [
+            executor.submit(
+                render_metric,
+                f"{save_path}/heatmap_{TASK_ID}_{TRIAL_ID}_{metric}.svg",
+                metric, sweep[metric], sweep['behavior'], compData, humanData, list(sweep.angles), list(sweep.velocities)
+            )
+            for metric in metrics
+        ]
+
+        #* the summaries are computed while the plots are drawn
+        for metric in metrics:
+            summaries[metric] = summarize(sweep[metric], compData)
+            print_summary(metric, summaries[metric])
+
+        for future in futures:
+            print(f"Saved {future.result()}")
+
+    return summaries
+
+def main():
+
+    # loading the data in a dictionary
+    with open(f"behaviors/computer/Computer_Behavior_{TASK_ID}_{TRIAL_ID}.json", 'r') as file:
+        compDict = json.load(file)
+
+    humanDict = load_human_labels(TASK_ID)
+
+    #* batch mode
+    if PLOT_DATA == "all":
+        summaries = render_all(compDict, humanDict, "output_plots/heatmaps")
+
+        os.makedirs("output_logs", exist_ok=True)
+        with open(f"output_logs/heatmap_stats_{TASK_ID}_{TRIAL_ID}.json", 'w') as file:
+            json.dump(summaries, file, indent=4)
+        return
+
+    humanData = processHuman(humanDict)
+    sweep = SweepGrid(compDict)
+
+    # the behaviors as the corresponding integers
+    compData = sweep.codes('behavior')
+
+    #* finding the per-behavior values of the metric
+    print_summary(PLOT_DATA, summarize(sweep[PLOT_DATA], compData))
+
+    #* plotting
+    fig = plt.figure(figsize=(10,9))
+    plot_metric(fig, PLOT_DATA, sweep[PLOT_DATA], sweep['behavior'], compData, humanData, list(sweep.angles), list(sweep.velocities))
     plt.show()
 
 if __name__ == "__main__":
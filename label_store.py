@@ -0,0 +1,104 @@
+# loading the human behaviors of a task. The json file is used when there is one, otherwise the batch manager
+#     workbook is converted once and the labels are cached (as json) next to it.
+#     - The cache is used while the workbook has the same modification time and size
+#     - If only the modification time changed (e.g. the file was copied or touched), the hash of the workbook is
+#         checked before parsing it again
+import os
+import json
+import hashlib
+
+HUMAN_DIR = "behaviors/human"
+LABEL_CACHE_DIR = f"{HUMAN_DIR}/label_cache"
+
+# the labels already loaded by this process, with the signature of their source
+_LABELS = {}
+
+def _file_hash(path: str) -> str:
+    hasher = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+def read_workbook(path: str) -> dict:
+    """
+    Function to read the labels from a batch manager workbook (iteration keys in column 1, behaviors in column 4)
+    """
+    import openpyxl as pxl
+
+    wb_file = pxl.load_workbook(path, read_only=True)
+    try:
+        sheet = wb_file.active
+        humanDict = {}
+        for row in sheet.iter_rows(min_row = 2, max_col = 4, values_only = True):
+            humanDict[row[0]] = row[3]
+    finally:
+        wb_file.close()
+
+    return humanDict
+
+def _write_cache(cache_file: str, cached: dict) -> None:
+    #* writing to a temporary file first so that a reader never sees half of it
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(temp_file, 'w') as file:
+        json.dump(cached, file)
+    os.replace(temp_file, cache_file)
+
+def load_workbook_labels(path: str, cache_dir: str = LABEL_CACHE_DIR) -> dict:
+    """
+    Function to get the labels of a batch manager workbook, parsing it only when the cache is out of date
+        - Args
+            - `path` : the workbook file
+            - `cache_dir` : the directory of the cached labels
+        - Returns
+            - dictionary of {iteration key : behavior}
+    """
+    stat = os.stat(path)
+    signature = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if path in _LABELS and _LABELS[path][0] == signature:
+        return dict(_LABELS[path][1])
+
+    cache_file = f"{cache_dir}/labels_{os.path.splitext(os.path.basename(path))[0]}.json"
+    try:
+        with open(cache_file, 'r') as file:
+            cached = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        cached = None
+
+    if cached is not None and (cached['mtime_ns'], cached['size']) == (stat.st_mtime_ns, stat.st_size):
+        humanDict = cached['labels']
+
+    else:
+        sha1 = _file_hash(path)
+
+        # same contents, only the modification time changed
+        if cached is not None and cached['sha1'] == sha1:
+            humanDict = cached['labels']
+        else:
+            humanDict = read_workbook(path)
+
+        _write_cache(cache_file, {
+            'mtime_ns' : stat.st_mtime_ns,
+            'size' : stat.st_size,
+            'sha1' : sha1,
+            'labels' : humanDict,
+        })
+
+    _LABELS[path] = (signature, humanDict)
+    return dict(humanDict)
+
+def load_human_labels(task_id: str, human_dir: str = HUMAN_DIR) -> dict:
+    """
+    Function to load the human behaviors of a task (from the json file, or from the batch manager workbook)
+        - Returns
+            - dictionary of {iteration key : behavior}
+    """
+    try:
+        with open(f"{human_dir}/Human_Behavior_{task_id}.json", 'r') as file:
+            return json.load(file)
+
+    # if there is no json file to refer to, go to the old xlsx file
+    except FileNotFoundError:
+        return load_workbook_labels(f"{human_dir}/{task_id}_batchManager.xlsx", f"{human_dir}/label_cache")
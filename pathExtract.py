@@ -2,15 +2,17 @@ import os
 import re
 import sys
 import json
+import hashlib
 import numpy as np
 import concurrent.futures # running multiple extractions at once
 
 from pathlib import Path
 from time import perf_counter
 from statistics import median
-from operator import itemgetter
 
-from bed_analysis import RegFile, DiscFile
+from bed_analysis import RegFile, DiscFile, FrameReader, ParticleFilter, _InitBed, _Bed
+from post_processing import OnlineClassifier, get_kinematics
+from contact_tracker import CONTACT_RATIO, ContactTracker, query_contacts
 
 TASK_ID = "Bennu_1x"
 try:
@@ -25,6 +27,25 @@ try:
 except IndexError:
     pass
 
+#* analyzing every n-th timestep away from the impact (1 --> every timestep, sparse sampling is opt-in)
+SAMPLE_STRIDE = 1
+
+#* the crater and the mound are looked for in the particles initially above this height
+#! resize the bed to minimize the looping times
+#! 1.4 --> 2.5 seconds
+#! 1.35 --> 3.0 seconds
+BED_CUTOFF = 0.13
+
+#* number of bed frames read ahead of the analysis
+PREFETCH_DEPTH = 2
+
+#* stop the extraction once the (online) classification can no longer change
+EARLY_EXIT = False
+
+#* initial bed analysis shared by all iterations of a sweep
+INIT_CACHE_DIR = "data_Extracts/init_cache"
+_INIT_CACHE = {}
+
 def get_points(
     time: tuple[int, int],
     bed_obj: RegFile, 
@@ -47,31 +68,69 @@ def get_points(
     #* computing the reduced bed
     bed = bed_obj.get_bed(*time, pIDs) # method returns a _Bed object
 
+    return analyze_bed(bed, disc_params)
+
+def analyze_bed(
+    bed: _Bed,
+    disc_params: tuple[float, float, float]
+    ) -> tuple[tuple[float, float], tuple[float, float], list[int]]:
+    """
+    Function to get the coordinate points for the mound and the crater of a bed that is already read in
+        - Args
+            - `bed` : the (reduced) bed at the timestep (`_Bed` object)
+            - `disc_params` : the (x, y, r) parameters of the disc passed in for contact
+        - Returns
+            - same as `get_points()`
+    """
+
     #* bed.surface
     #* bed.crater
 
-    #* computing the mound of the bed
-    dataDict = bed.get_input()
+    return bed.crater, find_mound(bed), find_contacts(bed, disc_params)
+
+def find_mound(bed: _Bed) -> tuple[float, float]:
+    """
+    Function to get the coordinate point of the mound of a bed
+        - Args
+            - `bed` : the (reduced) bed at the timestep (`_Bed` object)
+        - Returns
+            - `(mound_x, mound_y)` : coordinate points of the mound on the bed
+    """
 
     #! performance counter
     start_mound = perf_counter()
 
-    # computing the particle density from the
-    RADIUS_MULTIPLIER = 4
-    for key in dataDict:
-        dataDict[key]['p_count'] = bed.profile.P_count_near_particle( dataDict[key]['x'], dataDict[key]['y'], RADIUS_MULTIPLIER )
-    
-    # sorting the particles with more than 6 near counts by height
-    possible_mound = sorted(
-        [
-            [ dataDict[key]['x'],dataDict[key]['y'] ] for key in dataDict if (dataDict[key]['p_count'] > 6) and (dataDict[key]['x'] > bed.crater[0])
-        ],
-        key = itemgetter(1)
-    )
+    bed_xs = np.array(bed.get_data('x', as_array=True))
+    bed_ys = np.array(bed.get_data('y', as_array=True))
+
+    # the particles right of the crater (or the whole bed if the crater is at its right edge) from the top down
+    #* (the later particle first among equal heights, the same as the end of a stable sort by height)
+    for candidates in [ np.flatnonzero(bed_xs > bed.crater[0]), np.arange(len(bed_xs)) ]:
+        candidates = candidates[ np.lexsort((-candidates, -bed_ys[candidates])) ]
+
+        # computing the particle density only until the top 9 particles with more than 6 near counts are found
+        RADIUS_MULTIPLIER = 4
+        possible_mound = []
+        start, batch = 0, 16
+        while start < len(candidates) and len(possible_mound) < 9:
+            picks = candidates[start:start+batch]
+            p_counts = bed.profile.P_count_near_all(bed_xs[picks], bed_ys[picks], RADIUS_MULTIPLIER)
+            possible_mound.extend( picks[p_counts > 6].tolist() )
+            start, batch = start+batch, batch*2
+
+        if len(possible_mound) != 0:
+            break
+
+    #* a bed without any dense particles still gets its top particles as the mound
+    if len(possible_mound) == 0:
+        possible_mound = candidates.tolist()
+
+    # back to the order of the height
+    possible_mound = possible_mound[:9][::-1]
 
     # finding the x coordinate of the particle that has the smallest position with the computed mound height
-    xs = [pick[0] for pick in possible_mound[-9:]]
-    ys = [pick[1] for pick in possible_mound[-9:]]
+    xs = bed_xs[possible_mound].tolist()
+    ys = bed_ys[possible_mound].tolist()
     
     mound_y = median(ys)
     mound_x = xs[
@@ -81,84 +140,352 @@ def get_points(
     end_mound = perf_counter()
     print(f"  (mound time: {end_mound-start_mound: .3f})")
 
+    return mound_x, mound_y
+
+def find_contacts(bed: _InitBed, disc_params: tuple[float, float, float]) -> list[int]:
+    """
+    Function to get the particles in contact with the disc
+        - Args
+            - `bed` : the (reduced) bed at the timestep (`_InitBed` or `_Bed` object)
+            - `disc_params` : the (x, y, r) parameters of the disc passed in for contact
+        - Returns
+            - `touch_idx` : the IDs of the particles that the disc touches at that timeframe
+    """
     # determining contact points
     disc_x, disc_y, disc_r = disc_params
 
     #* disc_r * (the ratio of the disc R to the single particle R + disc R) * 110%
-    touch_idx = bed.is_within_circle( (disc_x, disc_y), disc_r*((1197+8075)/8075)*1.1)
+    return query_contacts(bed.get_input(), (disc_x, disc_y), disc_r*CONTACT_RATIO)
+
+def adaptive_sample(disc_data: dict, surface_y: float, stride: int, pad: int = 5) -> list[int]:
+    """
+    Function to pick the timestep indices at which the bed is analyzed. Every timestep around the \
+        impact (and whenever the disc is low enough to touch the bed) is kept, while the rest are \
+        sampled only every `stride` timesteps.
+        - Args
+            - `disc_data` : the disc output dictionary with arrays (`disc_xs`, `disc_ys`, `disc_rs`, and `disc_vx` if there is one)
+            - `surface_y` : the height of the top of the initial bed
+            - `stride` : the sampling interval outside of the impact window
+            - `pad` : the number of timesteps to keep dense on either side of the impact window
+        - Returns
+            - sorted list of the timestep indices to analyze
+    """
+    disc_xs = np.array(disc_data['disc_xs'])
+    disc_ys = np.array(disc_data['disc_ys'])
+    disc_r = disc_data['disc_rs'][0]
+    num_timesteps = len(disc_xs)
+
+    if stride <= 1:
+        return list(range(num_timesteps))
+
+    #* same acceleration as the one in Comparer.determine_behavior() (from the positions if there are no velocities)
+    _, acc_xs = get_kinematics(disc_data)
+
+    # the disc is not in free flight once the acceleration leaves the "airborne" band
+    hit = np.flatnonzero( (acc_xs[1:] <= -1e-2) | (acc_xs[1:] >= 1e-2) ) + 1
+
+    # nothing to focus on if an impact can't be found
+    if len(hit) == 0:
+        return list(range(num_timesteps))
+    impact = hit[0]
+
+    # the disc has left the crater once it moves 3 radii away from the impact point (crater_out in Comparer)
+    left = np.flatnonzero( (disc_xs - 3*disc_r) > disc_xs[impact] )
+    left = left[left > impact]
+    leave = left[0] if len(left) != 0 else num_timesteps-1
+
+    dense = np.zeros(num_timesteps, dtype=bool)
+    dense[ max(impact-pad, 0) : leave+pad+1 ] = True
+
+    #* contacts can happen whenever the disc is within reach of the surface (+ some mound height)
+    dense |= (disc_ys - disc_r*CONTACT_RATIO) < (surface_y + disc_r)
+
+    sparse = np.zeros(num_timesteps, dtype=bool)
+    sparse[::stride] = True
+    sparse[-1] = True
 
-    return bed.crater, (mound_x, mound_y), touch_idx
+    return np.flatnonzero(dense | sparse).tolist()
 
-def get_data_dict(bed_filepath: str, disc_filepath: str) -> list[float]:
+def get_init_products(bed_filepath: str, write_cache: bool = False) -> tuple[_InitBed, list[int]]:
+    """
+    Function to get the initial bed and its surface particles. The first frame of a dump file never changes, \
+        so the particle arrays and the surface are cached on disk under the path, modification time and size of the \
+        file, and the `_InitBed` (with its profile) is kept in memory for the rest of the process. A cached file is \
+        never parsed or hashed again.
+        - Args
+            - `bed_filepath` : the `dmp.reg` file to examine (only its first frame is read)
+            - `write_cache` : save the arrays and the surface to `INIT_CACHE_DIR` if they aren't cached yet \
+                (only the extraction does this, the other scripts only read the cache)
+        - Returns
+            - `initBed` : the initial bed (`_InitBed` object, shared and read-only)
+            - `surface` : the IDs of the surface particles of the initial bed
+    """
+    stat = os.stat(bed_filepath)
+    key = ( os.path.abspath(bed_filepath), stat.st_mtime_ns, stat.st_size )
+
+    if key in _INIT_CACHE:
+        return _INIT_CACHE[key]
+
+    cache_file = f"{INIT_CACHE_DIR}/init_{hashlib.sha1( repr(key).encode() ).hexdigest()}.json"
+    try:
+        with open(cache_file, 'r') as file:
+            cached = json.load(file)
+        surface = cached['surface']
+        on_surface = set(surface)
+
+        # (with the same surface flags that get_surface() sets)
+        bedDict = {
+            pID: {'x': x, 'y': y, 'r': r, 'surface': int(pID in on_surface)}
+            for pID, x, y, r in zip(cached['ids'], cached['x'], cached['y'], cached['r'])
+        }
+        initBed = _InitBed(bedDict)
+
+    # a missing (or partially written) cache file is computed again
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        reader = FrameReader(bed_filepath)
+        _, frame_lines = next(reader.raw_frames())
+        bedDict = reader.parse(frame_lines)
+
+        initBed = _InitBed(bedDict)
+        surface = initBed.get_surface()
+
+        if write_cache:
+            # writing to a temporary file first so that other workers never read a partial file
+            os.makedirs(INIT_CACHE_DIR, exist_ok=True)
+            with open(f"{cache_file}.{os.getpid()}", 'w') as file:
+                json.dump({
+                    'ids' : list(bedDict),
+                    **{ parameter: initBed.get_data(parameter, as_array=True) for parameter in ('x', 'y', 'r') },
+                    'surface' : surface,
+                }, file)
+            os.replace(f"{cache_file}.{os.getpid()}", cache_file)
+
+    _INIT_CACHE[key] = (initBed, surface)
+    return initBed, surface
+
+class Pipeline:
+    """
+    Class to stream the bed frames through a chain of extraction stages.
+
+    Every stage is a generator function `stage(frames, context)` that takes the records coming from the stage \
+        before it and yields them on (after adding its own results). Each record is a dictionary for one frame \
+        (`timestep`, `idx`, `bed`, ...), and `context` holds the data shared by all the frames. Only a handful of \
+        frames are ever held at once.
+
+        - `source` : the iterable of the records to start with
+        - `stages` : a list of (name, stage) pairs to run in order
+        - `context` : the dictionary passed in to every stage
+        - `source_name` : the name of the time spent waiting on `source` (e.g. 'queue wait' when the frames are \
+            read on a background thread, since the reading itself isn't timed then)
+    """
+
+    def __init__(self, source, stages: list[tuple], context: dict, source_name: str = 'read') -> None:
+        self.names = [source_name] + [ name for name, _ in stages ]
+
+        # the time spent inside each stage (including the ones before it)
+        self.__timings = { name: 0.0 for name in self.names }
+
+        frames = self.__timed(source_name, source)
+        for name, stage in stages:
+            frames = self.__timed(name, stage(frames, context))
+        self.__frames = frames
+
+    def __timed(self, name: str, frames):
+        frames = iter(frames)
+        while True:
+            start = perf_counter()
+            try:
+                record = next(frames)
+            except StopIteration:
+                self.__timings[name] += perf_counter()-start
+                return
+            self.__timings[name] += perf_counter()-start
+            yield record
+
+    def __iter__(self):
+        return self.__frames
+
+    def get_timings(self) -> dict:
+        """
+        Method to get the time spent in each stage alone (in seconds)
+        """
+        totals = [ self.__timings[name] for name in self.names ]
+        return { name: total - prev for name, total, prev in zip(self.names, totals, [0.0, *totals[:-1]]) }
+
+def geometry_stage(frames, context: dict):
+    """
+    Stage to find the crater and the mound of the bed
+    """
+    for record in frames:
+        bed = _Bed(record['bed'])
+        record['crater'] = bed.crater
+        record['mound'] = find_mound(bed)
+        yield record
+
+def contact_stage(frames, context: dict):
+    """
+    Stage to find the particles in contact with the disc
+    """
+    disc = context['disc']
+    for record in frames:
+        idx = record['idx']
+        record['contacts'] = find_contacts(
+            _InitBed(record['bed']),
+            ( disc['disc_xs'][idx], disc['disc_ys'][idx], disc['disc_rs'][idx] )
+        )
+        yield record
+
+def writer_stage(frames, context: dict):
+    """
+    Stage to write the results of each frame into the output dictionary (`context['disc']`), \
+        the contact set (`context['touched']`) and the contact intervals (`context['tracker']`)
+    """
+    outDict = context['disc']
+    particles_touched = context['touched']
+    tracker = context['tracker']
+    for record in frames:
+        idx = record['idx']
+
+        (outDict['crater_xs'][idx], outDict['crater_ys'][idx]) = record['crater']
+        (outDict['mound_xs'][idx], outDict['mound_ys'][idx]) = record['mound']
+
+        # updating the list with the unique particles encountered by the disc
+        particles_touched.update(record['contacts'])
+        tracker.update(idx, record['contacts'])
+
+        # printing the status
+        print(
+            f"Iteration {context['iteration']}\tTimestep: {record['timestep']}\
+                \r\tcrater_x: {outDict['crater_xs'][idx]}\n \
+                \r\tcrater_y: {outDict['crater_ys'][idx]}\n \
+                \r\tmound_x: {outDict['mound_xs'][idx]}\n \
+                \r\tmound_y: {outDict['mound_ys'][idx]}\n \
+                \r\tcontact_pIDs: {len(particles_touched)}\n"
+        )
+        yield record
+
+def classify_stage(frames, context: dict):
+    """
+    Stage to update the online classification (`context['classifier']`) with every frame. \
+        The frames stop once the decision is settled (only used with `early_exit`).
+    """
+    classifier = context['classifier']
+    for record in frames:
+        classifier.update(record['idx'], record['crater'], record['mound'], record['contacts'])
+        yield record
+
+        if classifier.is_settled():
+            print(f"Iteration {context['iteration']}\tsettled at timestep {record['timestep']}")
+            return
+
+#* the extraction stages in order (any of them can be swapped out through get_data_dict(), `classify` only runs with early_exit)
+STAGES = [
+    ('geometry', geometry_stage),
+    ('contacts', contact_stage),
+    ('writer', writer_stage),
+    ('classify', classify_stage),
+]
+
+def get_data_dict(bed_filepath: str, disc_filepath: str, sample_stride: int = 1, stages: dict = None, early_exit: bool = False) -> list[float]:
     """
     Function to unpack the data from the input files into a single dictionary with arrays
         - Args
             - `bed_filepath` : the `dmp.reg` file to examine
             - `disc_filepath` : the `dmp.disc` file to examine 
-            - 
+            - `sample_stride` : analyze only every `sample_stride` timesteps outside of the impact window. \
+                The crater/mound values of the skipped timesteps are interpolated, while the contacts are only \
+                counted at the analyzed ones. (1 analyzes every timestep)
+            - `stages` : {name: stage} to replace any of the default `STAGES` with
+            - `early_exit` : stop once the online classification is settled. \
+                The bed values of the remaining timesteps are held at the last analyzed ones.
+        - Raises
+            - `ValueError` if `stages` has a name that is not one of the `STAGES`
     """
-    pBed = RegFile(bed_filepath)
+    # a misspelled stage would otherwise be silently ignored
+    unknown = set(stages or {}) - set(dict(STAGES))
+    if unknown:
+        raise ValueError(f"Unknown stages: {sorted(unknown)} (expected some of {[ name for name, _ in STAGES ]})")
+
     pDisc = DiscFile(disc_filepath)
 
-    initBed = pBed.get_init_bed()
+    initBed, _ = get_init_products(bed_filepath, write_cache=True)
     
     # setting in the output dictionary to the parameters in the disc 
     outDict = {key: pDisc.get_data(key, as_array=True) for key in pDisc.dataDict[pDisc.timestep0]}
 
-    #! resize the bed to minimize the looping times
-    #! 1.4 --> 2.5 seconds
-    #! 1.35 --> 3.0 seconds
-    reduced_idx = initBed.is_greater('y', 0.13)
+    #* resize the bed to minimize the looping times
+    reduced_idx = initBed.is_greater('y', BED_CUTOFF)
 
-    #* the timesteps for which the data is significant
-    # ts_cutoff = pDisc.ts_cutoff
-    # reduced_ts = [ (t,b) for t,b in pBed.ts if b <= pDisc.ts_cutoff ]
-    reduced_ts = [ (t,b) for t,b in pBed.ts if b in pDisc.ts ]
+    #* the timesteps for which the data is significant (in the same order as the disc arrays)
+    ts_index = { timestep: idx for idx, timestep in enumerate(pDisc.ts) }
 
     # initializing the arrays
-    outDict['crater_xs'] = list(np.zeros(len(reduced_ts), dtype=float))
-    outDict['crater_ys'] = list(np.zeros(len(reduced_ts), dtype=float))
-    outDict['mound_xs'] = list(np.zeros(len(reduced_ts), dtype=float))
-    outDict['mound_ys'] = list(np.zeros(len(reduced_ts), dtype=float))
+    outDict['crater_xs'] = list(np.zeros(len(pDisc.ts), dtype=float))
+    outDict['crater_ys'] = list(np.zeros(len(pDisc.ts), dtype=float))
+    outDict['mound_xs'] = list(np.zeros(len(pDisc.ts), dtype=float))
+    outDict['mound_ys'] = list(np.zeros(len(pDisc.ts), dtype=float))
     
     #* a set that contains the pIDs of the particles that encounter the disc
     particles_touched = set()
 
-    #todo   Add a breaking condition here. This should be something that is retrieved from the disc file
-    for idx,time in enumerate(reduced_ts):
-
-        filename = re.findall("(V[0-9]+\.[0-9]+_A[0-9]+)",bed_filepath)[0]
-        print(f"Iteration {filename}\tTimestep: {time[1]}", end = "")
-
-        (outDict['crater_xs'][idx], outDict['crater_ys'][idx]), (outDict['mound_xs'][idx], outDict['mound_ys'][idx]), touch_IDs = get_points(
-            # args for get_points()
-
-            time, 
-            pBed, 
-            reduced_idx,
-            (
-            #* recall that for the disc, it's not called by the timestep
-            #* as they are all loaded as arrays already
-                outDict['disc_xs'][idx],
-                outDict['disc_ys'][idx],
-                outDict['disc_rs'][idx]
-            )
-        )
-        # updating the list with the unique particles encountered by the disc
-        particles_touched.update(touch_IDs)
+    #* when (and how long) each particle is in contact with the disc
+    tracker = ContactTracker()
+
+    #* the timesteps to actually analyze
+    surface_y = max(initBed.get_data('y', as_array=True))
+    sampled = adaptive_sample(outDict, surface_y, sample_stride)
+
+    #* the next frames are read and parsed on a background thread while the current one is analyzed
+    frames = FrameReader(
+        bed_filepath, 
+        [ pDisc.ts[idx] for idx in sampled ]
+    ).frames(ParticleFilter(ids=reduced_idx), PREFETCH_DEPTH)
+
+    # the records that go through the pipeline
+    source = ( {'timestep': timestep, 'idx': ts_index[timestep], 'bed': bedDict} for timestep, bedDict in frames )
+
+    context = {
+        'iteration' : re.findall("(V[0-9]+\.[0-9]+_A[0-9]+)",bed_filepath)[0],
+        'initBed' : initBed,
+        'disc' : outDict,
+        'touched' : particles_touched,
+        'tracker' : tracker,
+        # the online classification is only needed to stop early
+        'classifier' : OnlineClassifier(outDict, surface_y) if early_exit else None,
+    }
+    stages = {**dict(STAGES), **(stages or {})}
+    names = [ name for name, _ in STAGES if early_exit or name != 'classify' ]
+    pipeline = Pipeline(
+        source, [ (name, stages[name]) for name in names ], context,
+        # with prefetching, only the time spent waiting on the reader thread is seen here
+        source_name = 'queue wait' if PREFETCH_DEPTH > 0 else 'read'
+    )
 
-        # printing the status
-        print(
-            f"\
-                \r\tcrater_x: {outDict['crater_xs'][idx]}\n \
-                \r\tcrater_y: {outDict['crater_ys'][idx]}\n \
-                \r\tmound_x: {outDict['mound_xs'][idx]}\n \
-                \r\tmound_y: {outDict['mound_ys'][idx]}\n \
-                \r\tcontact_pIDs: {len(particles_touched)}\n"
-        )
+    analyzed = [ record['idx'] for record in pipeline ]
+
+    print(f"Iteration {context['iteration']} stage times: " + ", ".join(f"{name}: {t: .2f}s" for name, t in pipeline.get_timings().items()))
+
+    #* the online decision is only reported when it was used to stop early, a failed vote can't lose the extract
+    if early_exit:
+        try:
+            print(f"Iteration {context['iteration']} online decision: {context['classifier'].decide()[0]}")
+        except (ZeroDivisionError, ValueError) as e:
+            print(f"Iteration {context['iteration']} online decision failed: {e!r}")
     
+    # filling in the timesteps that were skipped (and holding the last values after an early exit)
+    if len(analyzed) != len(pDisc.ts):
+        for key in ['crater_xs', 'crater_ys', 'mound_xs', 'mound_ys']:
+            values = np.array(outDict[key])[analyzed]
+            filled = np.interp( range(len(pDisc.ts)), analyzed, values )
+            outDict[key] = list(filled)
+
     outDict['contact_pIDs'] = list(particles_touched)
 
+    # the contacts still open end at the last analyzed timestep (they aren't carried over the skipped ones)
+    tracker.finish()
+    outDict['contact_intervals'] = tracker.to_timesteps(pDisc.ts)
+    outDict['contact_counts'] = tracker.counts(len(pDisc.ts)).tolist()
+
     return outDict
 
 def get_disc_paths(filepath: str):
@@ -193,7 +520,7 @@ def get_path(filetype: str, angle: int, vel: float) -> str:
 def extract_to_json(bed_filepath: str, disc_filepath: str):
 
     # path = "C:/Users/moosu/projects/Research/lammps_manager/lammps_repeater/iterations_A90/iteration_V5.0_A90/dmp.reg.LIS01_V5.0_A90" 
-    outDict = get_data_dict(bed_filepath, disc_filepath)
+    outDict = get_data_dict(bed_filepath, disc_filepath, SAMPLE_STRIDE, early_exit=EARLY_EXIT)
 
     #todo   Write in values for keys ['num_timesteps'] and ['disc_r'] maybe for compatibility at the end of dict
     iteration = re.findall("(V[0-9]+\.[0-9]+_A[0-9]+)",bed_filepath)[0]
@@ -1,10 +1,51 @@
 from dataclasses import dataclass
+import os
 import json
+import hashlib
+import functools
 from statistics import median
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from scipy.signal import find_peaks
 import numpy as np
 
+from contact_tracker import ContactTracker
+
+#* features of each data extract, so that the votes can be changed without recomputing them
+#* (relative to the folder of the data extract --> data_Extracts/feature_cache for the extraction's output,
+#* outside of the extract folder so that it only holds the extracts)
+FEATURE_CACHE_DIR = os.path.join(os.pardir, "feature_cache")
+
+#! bump this whenever extract_features() changes
+FEATURE_VERSION = 3
+
+@dataclass(frozen=True)
+class ClassifierParams:
+    """
+    The thresholds used in the classification (the defaults are the hand-tuned values)
+        - features
+            - `peak_distance` : minimum distance between the peaks of the disc height
+            - `radius_ratio` : disc radius multiplier for the ricochet height
+            - `acc_band` : accelerations within +/- this are considered zero (airborne)
+            - `vel_band` : velocities within this fraction of the initial velocity are ignored
+        - votes
+            - `airborne_div` : airborne length per RC vote
+            - `min_RO` : number of contact particles above which RO gets votes
+            - `contact_weight` : FS votes for being in contact for the whole simulation (0 --> not used)
+    """
+    peak_distance: int = 40
+    radius_ratio: float = (1197+8075)/8075
+    acc_band: float = 1e-2
+    vel_band: tuple[float, float] = (0.97, 1.03)
+    airborne_div: int = 6
+    min_RO: int = 25
+    contact_weight: float = 0.0
+
+DEFAULT_PARAMS = ClassifierParams()
+
+# the parameters that change the features (the rest only change the votes)
+FEATURE_PARAMS = ('peak_distance', 'radius_ratio', 'acc_band', 'vel_band')
+
 class Comparer:
     """
     Class to compare and plot the extracted data
@@ -12,6 +53,7 @@ class Comparer:
     - Args:
         - `data_json` : path to the file that contains the relevant data
         - `human_decision` : the human decision for the specific iteration
+        - `params` : the thresholds used in the classification
 
     - Returns: 
         - a `_DecisionPackage` object which is pretty much a jumble of data that can be used to compare \
@@ -27,17 +69,21 @@ class Comparer:
                 crater_out: bool
                 impact_time: int
                 reason: list[str]
-                datas: dict
+                source: str
                 num_timesteps: int
 
+            (the time series are loaded from `source` only when `datas` is accessed)
+
     """
 
-    def __init__(self, data_json: str, human_decision: str) -> None:
+    def __init__(self, data_json: str, human_decision: str, params: ClassifierParams = DEFAULT_PARAMS) -> None:
 
         self.filename = data_json
         self.human_decision = human_decision
+        self.params = params
 
-        self.dataDict = self.__process_file()
+        # loaded only when it is needed (see `dataDict`)
+        self.__dataDict = None
 
         #* the behavior decision will be determined as the Determiner object is instantiated.
         self.behavior_obj = self.determine_behavior()
@@ -50,6 +96,13 @@ class Comparer:
 
         return dataDict
 
+    @property
+    def dataDict(self) -> dict:
+        #* the data extract is read in on the first access
+        if self.__dataDict is None:
+            self.__dataDict = self.__process_file()
+        return self.__dataDict
+
 
     def get_data(self, parameter: str, as_array: bool = False):
         """
@@ -75,272 +128,558 @@ class Comparer:
         #todo   Any changes to the behavior-determining method must be implemented here
         #todo   
         #todo   WIP:
-        #todo       - getting indices of particles in contact with the disc at a timeframe (hard)
         #todo       - making voting less binary --> changing the voting values based on thresholds
         #todo       - a reasonable tie-breaker algorithm
         #todo   
         #todo   
-        
-        #* Getting attributes
-        num_timesteps = len(self.dataDict[next(iter(self.dataDict.keys()))])
-        # num_timesteps = 201
-
-        #* disc data
-        disc_xs = np.array(self.get_data('disc_xs', as_array=True))
-        disc_ys = np.array(self.get_data('disc_ys', as_array=True))
-        try:
-            disc_r = np.array(self.get_data('disc_rs', as_array=True))[0]
-        except KeyError:
-            disc_r = np.array(self.dataDict['disc_r'])
-        
-        #* disc particles contact
-        contact_pIDs = self.dataDict['contact_pIDs']
-
-        #* bed data
-        crater_xs = np.array(self.get_data('crater_xs', as_array=True))
-        crater_ys = np.array(self.get_data('crater_ys', as_array=True))
-        mound_xs = np.array(self.get_data('mound_xs', as_array=True))
-        mound_ys = np.array(self.get_data('mound_ys', as_array=True))
-
-        #* finding the peaks of the disc
-        peaks, _ = find_peaks(
-            disc_ys,
-            distance = 40,
+
+        #* the features are only extracted once per data extract (see `get_features()`)
+        #* (the data extract isn't read at all if they are cached)
+        features = get_features(self.filename, self.__dataDict, self.params)
+
+        #* voting based on the features
+        behavior, confidence, decisionDict, reasons = vote(features, self.params)
+
+        return _DecisionPackage(
+            iteration=self.filename[-13:-5],
+            computer_decision=behavior,
+            confidence=confidence,
+            human_decision=self.human_decision,
+            decisionDict=decisionDict,
+
+            # conditional datas
+            contact_pIDs=features['contact_pIDs'],
+            airborne=features['airborne'],
+            switches=features['switches'],
+            surpasses=features['surpasses'],
+            crater_out=features['crater_out'],
+            impact_time=features['impact_time'],
+            reasons=reasons,
+            source=self.filename,
+            num_timesteps=features['num_timesteps'],
         )
-        try:
-            max_disc_y = disc_ys[peaks][0]
-        except IndexError:
-            max_disc_y = median(disc_ys)
 
-        #* initializing the decision dictionary
-        
-        decisionDict = {
-            'FS' : 0,
-            'RO' : 0, # decisionDict offset
-            'RC' : 0
-        }
-        reasons = [f"{list(decisionDict.values())} : start"]
 
-        #* airborne state analysis
-        
-        # vel_xs = np.array(self.get_data('disc_vx', as_array=True)) #! not in old datafiles
-        try:
-            vel_xs = np.array(self.get_data('disc_vx', as_array=True))
-        except KeyError:
-            vel_xs = np.gradient(disc_xs,num_timesteps)
-            self.dataDict['disc_vx'] = vel_xs
+def get_kinematics(dataDict: dict) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Function to get the x velocity and acceleration of the disc
+        - Args
+            - `dataDict` : the data extract
+        - Returns
+            - `vel_xs` : the x velocity (the gradient of the x position in older data extracts)
+            - `acc_xs` : the (scaled) x acceleration
+    """
+    num_timesteps = len(dataDict[next(iter(dataDict.keys()))])
 
-        
-        #! vx, vyalready inclded in dataDict for new dataset
-        #* adding the data to the decisiondict
-        acc_xs = np.gradient(vel_xs,num_timesteps)*(1e8)
+    #! vx, vyalready inclded in dataDict for new dataset
+    try:
+        vel_xs = np.array(dataDict['disc_vx'])
+    except KeyError:
+        vel_xs = np.gradient(np.array(dataDict['disc_xs']),num_timesteps)
 
-        self.dataDict['disc_ax'] = acc_xs
-        
-        length = 0
-        length_array = []
+    acc_xs = np.gradient(vel_xs,num_timesteps)*(1e8)
 
-        for idx, (acc,vel) in enumerate(zip(acc_xs, vel_xs)):
-            
-            #ignoring cases where the velocity is effectively zero
-            if idx == 0 or ( ( -1e-06 < vel < 1e-06 ) or (vel_xs[0]*0.97 < vel < vel_xs[0]*1.03) ):
-                continue
-            
-            #for cases where acceleration is effectively zero
-            if -1e-2 < acc < 1e-2:
-                # length += 1
-                #! since we are skipping timesteps
-                length += 2
-
-            else:
-                length_array.append(length)
-                length = 0
-
-        #* initializing certain behavior indicators
-        switches = ['up']
-        impact_time = None
-        surpasses = False
-        crater_out = False
-
-        for timestep, (mound_h, disc_h, mound_x, disc_x, crater_x, acc_x) in enumerate(zip(mound_ys,disc_ys,mound_xs,disc_xs,crater_xs,acc_xs)):
-
-            # if at any point the difference between the mound height and the disc height is larger than the diameter -> ricochet
-            # if (disc_r*(1197+8075)/8075) < disc_h-mound_h:
-            if (disc_h - disc_r*(1197+8075)/8075) > mound_h:
-                # behavior = "RC"
-
-                # if this never happened then do this
-                if (decisionDict["RC"] == 0) and (len(switches) > 1):
-                    
-                    decisionDict["FS"] -= 1
-                    decisionDict["RO"] -= 1
-                    decisionDict["RC"] += 1
-                    reasons.append(f"{list(decisionDict.values())} : disc_h-mound_h > disc_r")
-
-            #? defining impact time
-            if acc_x != 0:
-                if impact_time is None:
-                    impact_time = timestep
-            
-            # if the disc gets far away from the crater
-            if (disc_x - 3*disc_r) > crater_x and crater_out is False:
-                crater_out = True
-                crater_comp_x, disc_comp_x = crater_x, disc_x-3*disc_r
-
-            # if at any point the disc surpasses the mound
-            if disc_x > mound_x and surpasses is False:
-                surpasses = True
-
-            # checking switches in height between the mound and the disc
-            if disc_h < mound_h:
-                if switches[-1] != 'down':
-                    switches.append('down')
-
-            if disc_h > mound_h:
-                if switches[-1] != 'up':
-                    switches.append('up')
-        
-        #* voting based on certain conditions
-        #* ----------------------------------
-        if len(switches) < 3: #* low priority because some lower attack angles don't ever cross paths.
-            # behavior = "FS"
-            decisionDict["FS"] += 1
-            # decisionDict["RO"] -= 1
-            # decisionDict["RC"] -= 1
-            reasons.append(f"{list(decisionDict.values())} : len(switches) < 3")
-        else:
-            decisionDict["FS"] -= 1
-            reasons.append(f"{list(decisionDict.values())} : len(switches) > 3 (switches: {len(switches)})")
+    return vel_xs, acc_xs
 
-        #* if the impactor moves a significant distance away from the impact crater
-        if crater_out is True:
-            decisionDict["FS"] -= 1
-            reasons.append(f"{list(decisionDict.values())} : crater_out is True (disc_x-3*disc_r/crater_x = {disc_comp_x:.3f}/{crater_comp_x:.3f})")
-        else:
-            decisionDict["FS"] += 1
-            reasons.append(f"{list(decisionDict.values())} : crater_out is False")
-        
-        #* if the bottom of the impactor is higher than the max height of the mound
-        max_mound = max(mound_ys)
-        if max_mound < max_disc_y-disc_r:
-            # behavior = "RO"
-            decisionDict["FS"] -= 1
-            decisionDict["RO"] -= 1
-            # decisionDict["RC"] += 1 
-            decisionDict["RC"] += int(( ((max_disc_y-disc_r)-max_mound)  / max_mound )//0.1)
-            reasons.append(f"{list(decisionDict.values())} : max_mound < max_disc_y - disc_r ({max_mound/max_mound} < {(max_disc_y-disc_r)/max_mound:.3f} --> +{int(( ((max_disc_y-disc_r)-max_mound)  / max_mound )//0.1)})")
-        else:
-            decisionDict["RC"] += int(( ((max_disc_y-disc_r)-max_mound)  / max_mound )//0.1) #(accounting for negative values as well)
-            # decisionDict["RO"] -= 1
 
-            reasons.append(f"{list(decisionDict.values())} : max_mound > max_disc_y - disc_r ({max_mound/max_mound} > {(max_disc_y-disc_r)/max_mound:.3f} --> {int(( ((max_disc_y-disc_r)-max_mound)  / max_mound )//0.1)})")
+def extract_features(dataDict: dict, params: ClassifierParams = DEFAULT_PARAMS) -> dict:
+    """
+    Function to compute the features that the votes are based on. This is the expensive part of the \
+        classification, and it doesn't depend on the voting rules at all.
+        - Args
+            - `dataDict` : the data extract
+            - `params` : the thresholds used in the classification
+        - Returns
+            - dictionary of the features (json serializable)
+    """
+    
+    #* Getting attributes
+    num_timesteps = len(dataDict[next(iter(dataDict.keys()))])
+
+    #* disc data
+    disc_xs = np.array(dataDict['disc_xs'])
+    disc_ys = np.array(dataDict['disc_ys'])
+    try:
+        disc_r = np.array(dataDict['disc_rs'])[0]
+    except KeyError:
+        disc_r = np.array(dataDict['disc_r'])
+
+    #* bed data
+    crater_xs = np.array(dataDict['crater_xs'])
+    mound_xs = np.array(dataDict['mound_xs'])
+    mound_ys = np.array(dataDict['mound_ys'])
+
+    #* features that only depend on the disc (peak height, airborne state)
+    vel_xs, acc_xs = get_kinematics(dataDict)
+    disc_only = _disc_features(disc_ys, vel_xs, acc_xs, params)
+
+    #* initializing certain behavior indicators
+    num = min(len(mound_ys), len(disc_ys), len(mound_xs), len(disc_xs), len(crater_xs), len(acc_xs))
+    mound_hs, disc_hs, mound_ps, disc_ps, crater_ps, acc_ps = (
+        arr[:num] for arr in (mound_ys, disc_ys, mound_xs, disc_xs, crater_xs, acc_xs)
+    )
+
+    # checking switches in height between the mound and the disc (starting as 'up')
+    side = np.where(disc_hs > mound_hs, 1, 0) - np.where(disc_hs < mound_hs, 1, 0)
+    sided = side != 0
+    states = np.concatenate( ([1], side[sided]) )
+    switched = np.zeros(num, dtype=int)
+    switched[sided] = states[1:] != states[:-1]
+
+    # the number of switches seen before each timestep
+    switches_before = 1 + np.cumsum(switched) - switched
+    num_switches = 1 + int(switched.sum())
+
+    # if at any point the difference between the mound height and the disc height is larger than the diameter -> ricochet
+    # (only the first time it happens after a switch counts)
+    ricochet = np.flatnonzero( ( (disc_hs - disc_r*params.radius_ratio) > mound_hs ) & (switches_before > 1) )
+
+    #? defining impact time
+    impacts = np.flatnonzero(acc_ps != 0)
+    impact_time = int(impacts[0]) if len(impacts) != 0 else None
+
+    # if the disc gets far away from the crater
+    outs = np.flatnonzero( (disc_ps - 3*disc_r) > crater_ps )
+    crater_out = len(outs) != 0
+
+    return {
+        'num_timesteps' : num_timesteps,
+        'max_disc_y' : disc_only['max_disc_y'],
+        'disc_r' : float(disc_r),
+        'max_mound' : float(max(mound_ys)),
+        'switches' : num_switches,
+        'ricochet' : len(ricochet) != 0,
+        'crater_out' : crater_out,
+        'crater_comp_x' : float(crater_ps[outs[0]]) if crater_out else None,
+        'disc_comp_x' : float(disc_ps[outs[0]]-3*disc_r) if crater_out else None,
+        # if at any point the disc surpasses the mound
+        'surpasses' : bool( np.any(disc_ps > mound_ps) ),
+        'has_runs' : disc_only['has_runs'],
+        'airborne' : disc_only['airborne'],
+        'impact_time' : impact_time,
+        # the number of unique particles encountered by the disc
+        'contact_pIDs' : len(dataDict['contact_pIDs']),
+        # the number of timesteps the disc is in contact with the bed (0 for older data extracts)
+        'contact_length' : int(np.count_nonzero(dataDict.get('contact_counts', []))),
+    }
 
 
-        #* analyzing the airborne case
-        try:
-            length = max(length_array)
-        
-        # this usually doesn't happen very often, if ever
-        except ValueError:
-            length = 0
-            decisionDict["FS"] += 1
-            decisionDict["RO"] += 1
-            decisionDict["RC"] -= 1
-            reasons.append(f"{list(decisionDict.values())} : length = 0 (ValueError Raised)")
-
-
-        #* if the impactor never surpasses the mound
-        if surpasses is False:
-            # behavior = "FS"
-            if len(switches) < 3:
-                decisionDict["FS"] += 2
-                reasons.append(f"{list(decisionDict.values())} : surpasses is False AND len(switches) < 3")
-            
+def _disc_features(disc_ys: np.ndarray, vel_xs: np.ndarray, acc_xs: np.ndarray, params: ClassifierParams) -> dict:
+    """
+    Function to compute the features that only depend on the disc (the first peak height and the airborne runs)
+    """
+
+    #* finding the peaks of the disc
+    peaks, _ = find_peaks(
+        disc_ys,
+        distance = params.peak_distance,
+    )
+    try:
+        max_disc_y = disc_ys[peaks][0]
+    except IndexError:
+        max_disc_y = median(disc_ys)
+    
+    #* airborne lengths --> runs of effectively zero acceleration
+    # ignoring the first timestep and cases where the velocity is effectively zero (or still the initial velocity)
+    low, high = params.vel_band
+    ignored = ( (-1e-06 < vel_xs) & (vel_xs < 1e-06) ) | ( (vel_xs[0]*low < vel_xs) & (vel_xs < vel_xs[0]*high) )
+    ignored[0] = True
+
+    #for cases where acceleration is effectively zero
+    flat = (-params.acc_band < acc_xs) & (acc_xs < params.acc_band)
+
+    # each counted timestep with a nonzero acceleration ends a run
+    ends = np.flatnonzero(~ignored & ~flat)
+    flat_count = np.cumsum(~ignored & flat)
+
+    #! since we are skipping timesteps (2 per timestep)
+    length_array = ( 2*np.diff(flat_count[ends], prepend=0) ).tolist()
+
+    return {
+        'max_disc_y' : float(max_disc_y),
+        'has_runs' : len(length_array) != 0,
+        'airborne' : max(length_array) if len(length_array) != 0 else 0,
+    }
+
+
+def get_features(data_json: str, dataDict: dict = None, params: ClassifierParams = DEFAULT_PARAMS, cache_dir: str = None) -> dict:
+    """
+    Function to get the features of a data extract. The features are saved in the cache folder the first \
+        time, and are recomputed only when the data extract (or one of the `FEATURE_PARAMS`) changes.
+        - Args
+            - `data_json` : path to the data extract
+            - `dataDict` : the data extract, if it is already loaded
+            - `params` : the thresholds used in the classification
+            - `cache_dir` : the folder of the cached features \
+                (`FEATURE_CACHE_DIR` from the folder of the data extract if not given, never the working directory)
+        - Returns
+            - dictionary of the features (see `extract_features()`)
+    """
+    stat = os.stat(data_json)
+
+    #* only the feature parameters are part of the key, so changing a vote threshold reuses the features
+    feature_params = tuple( getattr(params, name) for name in FEATURE_PARAMS )
+    key = hashlib.sha1(
+        f"{os.path.abspath(data_json)}:{stat.st_mtime_ns}:{stat.st_size}:{FEATURE_VERSION}:{feature_params!r}".encode()
+    ).hexdigest()
+    if cache_dir is None:
+        cache_dir = os.path.normpath( os.path.join(os.path.dirname(os.path.abspath(data_json)), FEATURE_CACHE_DIR) )
+    cache_file = os.path.join(cache_dir, f"features_{key}.json")
+
+    # a missing (or partially written) cache file is computed again
+    try:
+        with open(cache_file, 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    if dataDict is None:
+        with open(data_json, 'r') as file:
+            dataDict = json.load(file)
+    features = extract_features(dataDict, params)
+
+    # writing to a temporary file first so that other workers never read a partial file
+    #* (the features are still returned if the cache can't be written, e.g. next to read-only extracts)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(f"{cache_file}.{os.getpid()}", 'w') as file:
+            json.dump(features, file, indent=4)
+        os.replace(f"{cache_file}.{os.getpid()}", cache_file)
+    except OSError:
+        pass
+
+    return features
+
+
+def vote(features: dict, params: ClassifierParams = DEFAULT_PARAMS) -> tuple[str, float, dict, list[str]]:
+    """
+    Function to vote on the behavior based on the features. This doesn't touch the data extract, so changing \
+        the voting rules only needs the (cached) features.
+        - Args
+            - `features` : the features from `extract_features()`
+            - `params` : the thresholds used in the classification
+        - Returns
+            - `behavior` : the behavior with the most votes
+            - `confidence` : the confidence of the decision
+            - `decisionDict` : the (shifted) votes
+            - `reasons` : the reasons for each change in the votes
+    """
+    num_switches = features['switches']
+    max_disc_y = features['max_disc_y']
+    disc_r = features['disc_r']
+
+    #* initializing the decision dictionary
+    
+    decisionDict = {
+        'FS' : 0,
+        'RO' : 0, # decisionDict offset
+        'RC' : 0
+    }
+    reasons = [f"{list(decisionDict.values())} : start"]
+
+    # if at any point the difference between the mound height and the disc height is larger than the diameter -> ricochet
+    if features['ricochet']:
+        decisionDict["FS"] -= 1
+        decisionDict["RO"] -= 1
+        decisionDict["RC"] += 1
+        reasons.append(f"{list(decisionDict.values())} : disc_h-mound_h > disc_r")
+    
+    #* voting based on certain conditions
+    #* ----------------------------------
+    if num_switches < 3: #* low priority because some lower attack angles don't ever cross paths.
+        # behavior = "FS"
+        decisionDict["FS"] += 1
+        # decisionDict["RO"] -= 1
+        # decisionDict["RC"] -= 1
+        reasons.append(f"{list(decisionDict.values())} : len(switches) < 3")
+    else:
+        decisionDict["FS"] -= 1
+        reasons.append(f"{list(decisionDict.values())} : len(switches) > 3 (switches: {num_switches})")
+
+    #* if the impactor moves a significant distance away from the impact crater
+    if features['crater_out'] is True:
+        decisionDict["FS"] -= 1
+        reasons.append(f"{list(decisionDict.values())} : crater_out is True (disc_x-3*disc_r/crater_x = {features['disc_comp_x']:.3f}/{features['crater_comp_x']:.3f})")
+    else:
+        decisionDict["FS"] += 1
+        reasons.append(f"{list(decisionDict.values())} : crater_out is False")
+    
+    #* if the bottom of the impactor is higher than the max height of the mound
+    max_mound = features['max_mound']
+    if max_mound < max_disc_y-disc_r:
+        # behavior = "RO"
+        decisionDict["FS"] -= 1
+        decisionDict["RO"] -= 1
+        # decisionDict["RC"] += 1 
+        decisionDict["RC"] += int(( ((max_disc_y-disc_r)-max_mound)  / max_mound )//0.1)
+        reasons.append(f"{list(decisionDict.values())} : max_mound < max_disc_y - disc_r ({max_mound/max_mound} < {(max_disc_y-disc_r)/max_mound:.3f} --> +{int(( ((max_disc_y-disc_r)-max_mound)  / max_mound )//0.1)})")
+    else:
+        decisionDict["RC"] += int(( ((max_disc_y-disc_r)-max_mound)  / max_mound )//0.1) #(accounting for negative values as well)
+        # decisionDict["RO"] -= 1
+
+        reasons.append(f"{list(decisionDict.values())} : max_mound > max_disc_y - disc_r ({max_mound/max_mound} > {(max_disc_y-disc_r)/max_mound:.3f} --> {int(( ((max_disc_y-disc_r)-max_mound)  / max_mound )//0.1)})")
+
+
+    #* analyzing the airborne case
+    length = features['airborne']
+    
+    # this usually doesn't happen very often, if ever
+    if not features['has_runs']:
+        decisionDict["FS"] += 1
+        decisionDict["RO"] += 1
+        decisionDict["RC"] -= 1
+        reasons.append(f"{list(decisionDict.values())} : length = 0 (ValueError Raised)")
+
+
+    #* if the impactor never surpasses the mound
+    if features['surpasses'] is False:
+        # behavior = "FS"
+        if num_switches < 3:
             decisionDict["FS"] += 2
-            decisionDict["RO"] -= 1
-            decisionDict["RC"] -= 1
-            reasons.append(f"{list(decisionDict.values())} : surpasses is False")
+            reasons.append(f"{list(decisionDict.values())} : surpasses is False AND len(switches) < 3")
         
-        #* airborne
-        if length > 1: #! starting at just 1% of the total simulation time
-            # behavior = 'RC'
-            # decisionDict["FS"] -= 1
-            # decisionDict["RO"] -= 1
-            decisionDict["RC"] += length//6 #* by threshold
-            reasons.append(f"{list(decisionDict.values())} : length > 1 (length = {length}) --> +{length//6}")
+        decisionDict["FS"] += 2
+        decisionDict["RO"] -= 1
+        decisionDict["RC"] -= 1
+        reasons.append(f"{list(decisionDict.values())} : surpasses is False")
+    
+    #* airborne
+    if length > 1: #! starting at just 1% of the total simulation time
+        # behavior = 'RC'
+        # decisionDict["FS"] -= 1
+        # decisionDict["RO"] -= 1
+        decisionDict["RC"] += length//params.airborne_div #* by threshold
+        reasons.append(f"{list(decisionDict.values())} : length > 1 (length = {length}) --> +{length//params.airborne_div}")
+    else:
+        decisionDict["FS"] += 1
+        decisionDict["RO"] += 1
+        decisionDict["RC"] -= 1
+        reasons.append(f"{list(decisionDict.values())} : length < 1 (length = {length})")
+
+    #* implementing stuff using contact pIDs
+    unique_pIDs = features['contact_pIDs']
+    #    reasons.append(f"{list(decisionDict.values())} : unique_pID = {unique_pIDs} > 26 --> -{abs(unique_pIDs - 26)//6}")
+    
+    # the minimum for RO is at around 25
+    min_RO = params.min_RO
+    if unique_pIDs > min_RO:
+        decisionDict["RO"] += abs(unique_pIDs-min_RO)//4
+        decisionDict["FS"] -= 1
+        decisionDict["RC"] -= 1
+        reasons.append(f"{list(decisionDict.values())} : unique_pID = {unique_pIDs} > {min_RO} --> {abs(unique_pIDs - 30)//4}")
+
+    #* length of contact (the longer the disc stays on the bed, the more likely it slides)
+    if params.contact_weight:
+        contact_votes = int(params.contact_weight*features['contact_length']/features['num_timesteps'])
+        decisionDict["FS"] += contact_votes
+        reasons.append(f"{list(decisionDict.values())} : contact_length = {features['contact_length']}/{features['num_timesteps']} --> +{contact_votes}")
+
+    #* behavior is the one with the most votes
+    for key, bias in decisionDict.items():
+        if bias == max(decisionDict.values()):
+            behavior = key
+            break
+
+    #* in the case that there is a tie, pick RO
+    if (decisionDict["FS"] == decisionDict["RO"]) and (decisionDict["RO"] > decisionDict["RC"]):
+        behavior = "RO"
+        reasons.append(f"{list(decisionDict.values())} : tiebreaker FS, RO -> RO")
+    if (decisionDict["RO"] == decisionDict["RC"]) and (decisionDict["RO"] > decisionDict["FS"]):
+        behavior = "RC"
+        reasons.append(f"{list(decisionDict.values())} : tiebreaker RC, RO -> RC")
+
+    #* shifting the votes to make the minimum zero 
+    shift_by = min( decisionDict.values() )
+    for key in decisionDict:
+        decisionDict[key] -= shift_by
+    
+    # working with only the top 2 choices
+    interm = list(decisionDict.values())
+    interm.remove(0)         
+
+    # computing confidence
+    confidence = round( (abs(interm[0]-interm[1])/max(interm) ), 2 )
+
+    #todo   The problem with this is that this yields values of 100% that seem unreasonable
+    #todo       - try changing it so that it is something like-->(current votes)/(total possible votes)
+
+    return behavior, confidence, decisionDict, reasons
+
+
+class OnlineClassifier:
+    """
+    Class to classify an iteration while it is being extracted. The disc data is known from the start, and the \
+        crater, mound and contacts come in one (analyzed) timestep at a time through `update()`.
+
+    The timesteps skipped between two updates are filled in the same way `get_data_dict()` interpolates them, \
+        and the bed is held at its last values after the latest update. So the features at any point are the ones \
+        that `extract_features()` would get from the data extract if the extraction stopped there.
+
+    - Args:
+        - `disc_data` : the disc output dictionary with arrays (`disc_xs`, `disc_ys`, `disc_rs`, `disc_vx`)
+        - `surface_y` : the height of the top of the initial bed
+        - `params` : the thresholds used in the classification
+    """
+
+    def __init__(self, disc_data: dict, surface_y: float, params: ClassifierParams = DEFAULT_PARAMS) -> None:
+        self.params = params
+        self.surface_y = surface_y
+
+        self.num_timesteps = len(disc_data[next(iter(disc_data.keys()))])
+        self.disc_xs = np.array(disc_data['disc_xs'])
+        self.disc_ys = np.array(disc_data['disc_ys'])
+        self.disc_r = disc_data['disc_rs'][0]
+
+        #* the disc-only features are known from the start
+        vel_xs, acc_xs = get_kinematics(disc_data)
+        self.__disc_features = _disc_features(self.disc_ys, vel_xs, acc_xs, params)
+
+        impacts = np.flatnonzero(acc_xs != 0)
+        self.__impact_time = int(impacts[0]) if len(impacts) != 0 else None
+
+        # the lowest the disc gets after each timestep (for the reach of the disc)
+        bottoms = self.disc_ys - self.disc_r*params.radius_ratio*1.1
+        self.__lowest_after = np.append( np.minimum.accumulate(bottoms[::-1])[::-1][1:], np.inf )
+
+        self.__state = {
+            'side' : 1, # starting as 'up'
+            'switches' : 1,
+            'ricochet' : False,
+            'crater_out' : False,
+            'crater_comp_x' : None,
+            'disc_comp_x' : None,
+            'surpasses' : False,
+            'max_mound' : -np.inf,
+        }
+        self.__contacts = set()
+        self.__tracker = ContactTracker()
+
+        # the last update (index, crater_x, mound_x, mound_y)
+        self.__last = None
+
+    def update(self, idx: int, crater: tuple[float, float], mound: tuple[float, float], contacts: list[int]) -> None:
+        """
+        Method to add the results of an analyzed timestep (in increasing order of `idx`)
+        """
+        crater_x, mound_x, mound_y = crater[0], mound[0], mound[1]
+
+        if self.__last is None:
+            # held back to the first timestep (like np.interp)
+            ts = np.arange(0, idx+1)
+            values = [ np.full(len(ts), value, dtype=float) for value in (crater_x, mound_x, mound_y) ]
         else:
-            decisionDict["FS"] += 1
-            decisionDict["RO"] += 1
-            decisionDict["RC"] -= 1
-            reasons.append(f"{list(decisionDict.values())} : length < 1 (length = {length})")
+            prev_idx, *prev = self.__last
+            ts = np.arange(prev_idx+1, idx+1)
+            values = [
+                np.interp(ts, [prev_idx, idx], [before, after])
+                for before, after in zip(prev, (crater_x, mound_x, mound_y))
+            ]
+
+        self.__advance(self.__state, ts, *values)
+        self.__contacts.update(contacts)
+        self.__tracker.update(idx, contacts)
+        self.__last = (idx, crater_x, mound_x, mound_y)
+
+    def __advance(self, state: dict, ts: np.ndarray, crater_xs: np.ndarray, mound_xs: np.ndarray, mound_ys: np.ndarray) -> None:
+        #* same indicators as in extract_features(), continued from the state
+        if len(ts) == 0:
+            return
+        disc_xs, disc_ys, disc_r = self.disc_xs[ts], self.disc_ys[ts], self.disc_r
+
+        # checking switches in height between the mound and the disc
+        side = np.where(disc_ys > mound_ys, 1, 0) - np.where(disc_ys < mound_ys, 1, 0)
+        sided = side != 0
+        states = np.concatenate( ([state['side']], side[sided]) )
+        switched = np.zeros(len(ts), dtype=int)
+        switched[sided] = states[1:] != states[:-1]
+
+        switches_before = state['switches'] + np.cumsum(switched) - switched
+        state['ricochet'] |= bool( np.any( ( (disc_ys - disc_r*self.params.radius_ratio) > mound_ys ) & (switches_before > 1) ) )
+        state['switches'] += int(switched.sum())
+        state['side'] = int(states[-1])
+
+        # if the disc gets far away from the crater
+        outs = np.flatnonzero( (disc_xs - 3*disc_r) > crater_xs )
+        if not state['crater_out'] and len(outs) != 0:
+            state['crater_out'] = True
+            state['crater_comp_x'] = float(crater_xs[outs[0]])
+            state['disc_comp_x'] = float(disc_xs[outs[0]]-3*disc_r)
+
+        # if at any point the disc surpasses the mound
+        state['surpasses'] |= bool( np.any(disc_xs > mound_xs) )
+        state['max_mound'] = max(state['max_mound'], float(mound_ys.max()))
+
+    def get_features(self) -> dict:
+        """
+        Method to get the features so far (with the bed held at its last values for the rest of the timesteps)
+        """
+        state = dict(self.__state)
+        if self.__last is not None:
+            idx, *held = self.__last
+            rest = np.arange(idx+1, self.num_timesteps)
+            self.__advance(state, rest, *( np.full(len(rest), value, dtype=float) for value in held ))
+
+        return {
+            'num_timesteps' : self.num_timesteps,
+            'max_disc_y' : self.__disc_features['max_disc_y'],
+            'disc_r' : float(self.disc_r),
+            'max_mound' : state['max_mound'],
+            'switches' : state['switches'],
+            'ricochet' : state['ricochet'],
+            'crater_out' : state['crater_out'],
+            'crater_comp_x' : state['crater_comp_x'],
+            'disc_comp_x' : state['disc_comp_x'],
+            'surpasses' : state['surpasses'],
+            'has_runs' : self.__disc_features['has_runs'],
+            'airborne' : self.__disc_features['airborne'],
+            'impact_time' : self.__impact_time,
+            'contact_pIDs' : len(self.__contacts),
+            # (the contacts are only counted up to the last update, unlike the bed)
+            'contact_length' : int(np.count_nonzero( self.__tracker.counts(self.num_timesteps, self.__tracker.last) )),
+        }
 
-        #* implementing stuff using contact pIDs
-        # the number of unique particles encountered by the disc
-        unique_pIDs = len(contact_pIDs)
-        #    reasons.append(f"{list(decisionDict.values())} : unique_pID = {unique_pIDs} > 26 --> -{abs(unique_pIDs - 26)//6}")
-        
-        # the minimum for RO is at around 25
-        min_RO = 25
-        if unique_pIDs > min_RO:
-            decisionDict["RO"] += abs(unique_pIDs-min_RO)//4
-            decisionDict["FS"] -= 1
-            decisionDict["RC"] -= 1
-            reasons.append(f"{list(decisionDict.values())} : unique_pID = {unique_pIDs} > {min_RO} --> {abs(unique_pIDs - 30)//4}")
-
-        #* behavior is the one with the most votes
-        for key, bias in decisionDict.items():
-            if bias == max(decisionDict.values()):
-                behavior = key
-                break
-
-        #* in the case that there is a tie, pick RO
-        #todo 
-        #todo Implement length of contact as a factor of decision
-        #todo 
-
-        if (decisionDict["FS"] == decisionDict["RO"]) and (decisionDict["RO"] > decisionDict["RC"]):
-            behavior = "RO"
-            reasons.append(f"{list(decisionDict.values())} : tiebreaker FS, RO -> RO")
-        if (decisionDict["RO"] == decisionDict["RC"]) and (decisionDict["RO"] > decisionDict["FS"]):
-            behavior = "RC"
-            reasons.append(f"{list(decisionDict.values())} : tiebreaker RC, RO -> RC")
-
-        #* shifting the votes to make the minimum zero 
-        shift_by = min( decisionDict.values() )
-        for key in decisionDict:
-            decisionDict[key] -= shift_by
-        
-        # working with only the top 2 choices
-        interm = list(decisionDict.values())
-        interm.remove(0)         
+    def decide(self) -> tuple[str, float, dict, list[str]]:
+        """
+        Method to vote on the features so far (see `vote()`)
+        """
+        return vote(self.get_features(), self.params)
 
-        return _DecisionPackage(
-            iteration=self.filename[-13:-5],
-            computer_decision=behavior,
+    def is_settled(self) -> bool:
+        """
+        Method to check if the decision can no longer change. This is the case once the disc has left the crater, \
+            has gone past the mound and can't reach the bed (or the mound) again for the rest of the timesteps, \
+            since the bed doesn't change much after that.
+        """
+        if self.__last is None:
+            return False
 
-            # computing confidence
-            confidence=round( (abs(interm[0]-interm[1])/max(interm) ), 2 ),
+        idx = self.__last[0]
+        if idx >= self.num_timesteps-1:
+            return True
 
-            #todo   The problem with this is that this yields values of 100% that seem unreasonable
-            #todo       - try changing it so that it is something like-->(current votes)/(total possible votes)
+        state = self.__state
+        top = max(self.surface_y, state['max_mound'])
+        return state['crater_out'] and state['surpasses'] and self.__lowest_after[idx] >= top + self.disc_r
 
-            human_decision=self.human_decision,
-            decisionDict=decisionDict,
 
-            # conditional datas
-            contact_pIDs=len(self.dataDict['contact_pIDs']),
-            airborne=length,
-            switches=len(switches),
-            surpasses=surpasses,
-            crater_out=crater_out,
-            impact_time=impact_time,
-            reasons=reasons,
-            datas=self.dataDict,
-            num_timesteps=num_timesteps,
-        )
+@functools.lru_cache(maxsize=4)
+def load_datas(data_json: str) -> dict:
+    """
+    Function to load the time series of a data extract for plotting, with the disc velocity and acceleration \
+        (`disc_vx`, `disc_ax`) added in. The last few are kept in memory.
+    """
+    with open(data_json, 'r') as file:
+        dataDict = json.load(file)
 
+    vel_xs, acc_xs = get_kinematics(dataDict)
+    if 'disc_vx' not in dataDict: #! not in old datafiles
+        dataDict['disc_vx'] = vel_xs
+    dataDict['disc_ax'] = acc_xs
 
-@dataclass(frozen=True)
+    return dataDict
+
+
+@dataclass(frozen=True, slots=True)
 class _DecisionPackage:
     iteration: str
     computer_decision: str
@@ -354,141 +693,193 @@ class _DecisionPackage:
     crater_out: bool
     impact_time: int
     reasons: list[str]
-    datas: dict
+    source: str
     num_timesteps: int
 
-class Visualizer:
+    @property
+    def datas(self) -> dict:
+        #* the time series are only kept by reference to the data extract
+        return load_datas(self.source)
 
-    def __init__(self, data_package: _DecisionPackage) -> None:
-        self.data_package = data_package
+def lttb_indices(xs: np.ndarray, ys: np.ndarray, num_points: int) -> np.ndarray:
+    """
+    Function to pick the points of a series to keep with the Largest-Triangle-Three-Buckets algorithm. The first \
+        and last points are always kept, and every bucket in between keeps the point that makes the largest \
+        triangle with the averages of the buckets on either side (which keeps the peaks). Using the average of \
+        the previous bucket (instead of the point kept from it) lets all the buckets be picked at once.
+        - Args
+            - `xs`, `ys` : the series (`xs` increasing)
+            - `num_points` : the number of points to keep
+        - Returns
+            - the (sorted) indices of the points to keep
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    num = len(xs)
+    if num_points >= num or num_points < 3:
+        return np.arange(num)
 
+    # (num_points-2) buckets between the first and the last points
+    edges = np.linspace(1, num-1, num_points-1).astype(int)
+    idx = np.arange(1, num-1)
+    bucket = np.searchsorted(edges, idx, side='right') - 1
 
-    def path_plots(self, path: str, format: str):
-        #todo   Make this a method within some some other "plotter" class or something.
-        #todo
+    counts = np.bincount(bucket)
+    avg_xs = np.bincount(bucket, weights=xs[idx]) / counts
+    avg_ys = np.bincount(bucket, weights=ys[idx]) / counts
 
-        package = self.data_package
+    # the points on either side of each bucket (the first/last points at the ends)
+    prev_xs, prev_ys = np.append(xs[0], avg_xs[:-1])[bucket], np.append(ys[0], avg_ys[:-1])[bucket]
+    next_xs, next_ys = np.append(avg_xs[1:], xs[-1])[bucket], np.append(avg_ys[1:], ys[-1])[bucket]
+
+    area = np.abs( (prev_xs-next_xs)*(ys[idx]-prev_ys) - (prev_xs-xs[idx])*(next_ys-prev_ys) )
+    area[np.isnan(area)] = -1.0
+
+    #* the (first) point with the largest area in each bucket
+    largest = np.maximum.reduceat(area, edges[:-1]-1)
+    hits = np.flatnonzero(area == largest[bucket])
+    firsts = hits[ np.diff(bucket[hits], prepend=-1) != 0 ]
+
+    return np.concatenate( ([0], idx[firsts], [num-1]) )
+
+def decimate(xs, ys, max_points: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Function to downsample a series to at most `max_points` points while keeping its shape (see `lttb_indices()`). \
+        Paths that go back and forth in x are decimated along their index instead.
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    if max_points is None or len(xs) <= max_points:
+        return xs, ys
+
+    if np.all(np.diff(xs) >= 0):
+        keep = lttb_indices(xs, ys, max_points)
+    else:
+        #* keeping the shape of both coordinates over time
+        idx = np.arange(len(xs))
+        keep = np.union1d( lttb_indices(idx, xs, max_points//2), lttb_indices(idx, ys, max_points//2) )
+
+    return xs[keep], ys[keep]
+
+class PathPlotTemplate:
+    """
+    Class for the figure layout of `Visualizer.path_plots()`. The figure, axes and lines are built only once \
+        (on the non-interactive Agg canvas), and only the line data, titles and legend labels are swapped \
+        for every iteration.
+    """
+
+    # (title, x label, y label, line styles) of each panel
+    PANELS = [
+        ("Heights vs Time", "Time", "Height", ['r-', 'b-']),
+        ("X-positions vs Time", "Time", "X-position", ['r-', 'b-']),
+        ("X and Y positions", "X", "Y", ['r-', 'b-']),
+        ("Disc X-Velocity", "Time", "X-Velocity", ['k-']),
+        ("Disc X-Acceleration", "Time", "X-Acceleration", ['k-']),
+        ("Disc Y vs Crater Y", "Time", "Y-pos", ['-r', '-b']),
+    ]
+
+    def __init__(self) -> None:
+        self.fig = Figure(figsize = (14,10))
+        FigureCanvasAgg(self.fig)
+
+        self.title = self.fig.suptitle("", fontweight = 'bold')
+        self.fig.patch.set_alpha(1.0)
+
+        self.axes = list( self.fig.subplots(2,3).flat )
+        self.lines = []
+        for ax, (title, xlabel, ylabel, styles) in zip(self.axes, self.PANELS):
+            self.lines.append([ ax.plot([], [], style)[0] for style in styles ])
+            ax.grid(visible = True)
+            ax.set_title(title)
+            ax.set_xlabel(xlabel)
+            ax.set_ylabel(ylabel)
+
+    def __series(self, package: _DecisionPackage) -> list[list[tuple]]:
+        #* the (x, y, label) of every line in each panel
+        datas = package.datas
         
         # the timesteps involved
         ts = range(package.num_timesteps)
 
-        #* Plotting
-        fig, (
-            (ax1, ax2, ax3),
-            (ax4, ax5, ax6)
-        ) = plt.subplots(2,3, figsize = (14,10))
-
-        fig.suptitle(
-            f"{package.iteration}; human/comp: [{package.human_decision}/{package.computer_decision}] (confidence: {package.confidence})",
-            fontweight = 'bold'
+        return [
+            #* disc height vs mound height
+            [
+                (ts, datas['mound_ys'], "mound height"),
+                (ts, datas['disc_ys'], "disc height\nswitches: {}".format(package.switches)),
+            ],
+            #* disc x vs mound x
+            [
+                (ts, datas['mound_xs'], "mound x"),
+                (ts, datas['disc_xs'], "disc x"),
+            ],
+            # Path comparison plot (mound vs disc)
+            [
+                #mound data before the impact time is not significant
+                (datas['mound_xs'][package.impact_time:], datas['mound_ys'][package.impact_time:], "mound pos"),
+                (datas['disc_xs'], datas['disc_ys'], "disc pos"),
+            ],
+            # vx vs time
+            [
+                (ts, datas['disc_vx'], f"x-velocity (length={package.airborne})"),
+            ],
+            #acc vs time
+            [
+                (ts, datas['disc_ax'], f"x-acc (length={package.airborne})"),
+            ],
+            # crater y vs time
+            [
+                (ts, datas['crater_ys'], "Crater Height"),
+                (ts, datas['disc_ys'], f"Disc Height\nCrater out: {package.crater_out}"),
+            ],
+        ]
+
+    def render(self, package: _DecisionPackage, path: str, format: str, max_points: int = None, rasterize: bool = False) -> None:
+        """
+        Method to draw the data of a decision package onto the figure and save it
+            - Args
+                - `package` : the decision package to plot
+                - `path`, `format` : the directory and the format of the saved figure
+                - `max_points` : downsample each line to at most this many points (`None` for full resolution)
+                - `rasterize` : draw the lines as images (the text and axes stay vector graphics in svg/pdf)
+        """
+        self.title.set_text(
+            f"{package.iteration}; human/comp: [{package.human_decision}/{package.computer_decision}] (confidence: {package.confidence})"
         )
 
-        fig.patch.set_alpha(1.0)
+        for ax, lines, series in zip(self.axes, self.lines, self.__series(package)):
+            for line, (xs, ys, label) in zip(lines, series):
+                line.set_data(*decimate(xs, ys, max_points))
+                line.set_label(label)
+                line.set_rasterized(rasterize)
 
-        #* disc height vs mound height
-        ax1.plot(
-            ts,
-            package.datas['mound_ys'],
-            'r-',
-            label = "mound height"
-        )
-        ax1.plot(
-            ts,
-            package.datas['disc_ys'],
-            'b-',
-            label = "disc height\nswitches: {}".format(package.switches)
-        )
-        ax1.grid(visible = True)
-        ax1.set_title("Heights vs Time")
-        ax1.set_xlabel("Time")
-        ax1.set_ylabel("Height")
-        ax1.legend()
-
-        #* disc x vs mound x
-        ax2.plot(
-            ts,
-            package.datas['mound_xs'],
-            'r-',
-            label = "mound x"
-        )
-        ax2.plot(
-            ts,
-            package.datas['disc_xs'],
-            'b-',
-            label = "disc x"
-        )
-        ax2.grid(visible = True)
-        ax2.set_title("X-positions vs Time")
-        ax2.set_xlabel("Time")
-        ax2.set_ylabel("X-position")
-        ax2.legend()
-
-        # Path comparison plot (mound vs disc)
-        ax3.plot(
-            #mound data before the impact time is not significant
-            package.datas['mound_xs'][package.impact_time:],
-            package.datas['mound_ys'][package.impact_time:],
-            'r-',
-            label = "mound pos"
-        )
-        ax3.plot(
-            package.datas['disc_xs'],
-            package.datas['disc_ys'],
-            'b-',
-            label = "disc pos"
-        )
-        ax3.grid(visible = True)
-        ax3.set_title("X and Y positions")
-        ax3.set_xlabel("X")
-        ax3.set_ylabel("Y")
-        ax3.legend()
-
-        # vx vs time
-        ax4.plot(
-            ts,
-            package.datas['disc_vx'],
-            'k-',
-            label = f"x-velocity (length={package.airborne})",
-        )
-        ax4.grid(visible = True)
-        ax4.set_title("Disc X-Velocity")
-        ax4.set_xlabel("Time")
-        ax4.set_ylabel("X-Velocity")
-        ax4.legend()
-
-        #acc vs time
-        ax5.plot(
-            ts,
-            package.datas['disc_ax'],
-            'k-',
-            label = f"x-acc (length={package.airborne})",
-        )
-        ax5.grid(visible = True)
-        ax5.set_title("Disc X-Acceleration")
-        ax5.set_xlabel("Time")
-        ax5.set_ylabel("X-Acceleration")
-        ax5.legend()
-
-        #acc vs time
-        ax6.plot(
-            ts,
-            package.datas['crater_ys'],
-            '-r',
-            label = "Crater Height",
-        )
-        ax6.plot(
-            ts,
-            package.datas['disc_ys'],
-            '-b',
-            label = f"Disc Height\nCrater out: {package.crater_out}",
-        )
-        ax6.grid(visible = True)
-        ax6.set_title("Disc Y vs Crater Y")
-        ax6.set_xlabel("Time")
-        ax6.set_ylabel("Y-pos")
-        ax6.legend()
+            ax.relim()
+            ax.autoscale_view()
+            ax.legend()
 
-        plt.savefig(f"{path}/path_{package.iteration}.{format}", format = format)
-        plt.close()
+        self.fig.savefig(f"{path}/path_{package.iteration}.{format}", format = format)
 
-        
+# one figure template per process (see `get_path_template()`)
+_PATH_TEMPLATE = None
+
+def get_path_template() -> PathPlotTemplate:
+    """
+    Function to get the figure template of the path plots (built on the first call in each process)
+    """
+    global _PATH_TEMPLATE
+    if _PATH_TEMPLATE is None:
+        _PATH_TEMPLATE = PathPlotTemplate()
+    return _PATH_TEMPLATE
+
+class Visualizer:
+
+    def __init__(self, data_package: _DecisionPackage) -> None:
+        self.data_package = data_package
+
+
+    def path_plots(self, path: str, format: str, max_points: int = None, rasterize: bool = False):
+        #todo   Make this a method within some some other "plotter" class or something.
+        #todo
+
+        #* the figure is only built once per process, and reused for every plot
+        #* (max_points/rasterize for lighter review plots, see PathPlotTemplate.render())
+        get_path_template().render(self.data_package, path, format, max_points, rasterize)
@@ -1,16 +1,178 @@
 import os
-from math import sqrt
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
 
-from bed_analysis import RegFile
+from bed_analysis import FrameReader, ParticleFilter, _InitBed
+from pathExtract import get_init_products
 
-def main():
-    base = Path(os.getcwd())
-    base.parent.absolute()
+#* the dump file to examine
+try:
+    PULSE_PATH = sys.argv[1]
+except IndexError:
+    PULSE_PATH = str( Path(os.getcwd()).parent.absolute() / "lammps_repeater" / "iterations_A90" / "iteration_V5.0_A90" / "dmp.reg.LIS01_V5.0_A90" )
+
+#* "surface" --> pulse map of the whole surface, "tracked" --> paths of a few picked particles
+try:
+    MODE = sys.argv[2]
+except IndexError:
+    MODE = "surface"
+
+# the pulse arrives at a particle when its acceleration first reaches this fraction of the largest acceleration
+ARRIVAL_RATIO = 0.1
+
+def get_init_bed(bed_filepath: str) -> _InitBed:
+    """
+    Function to get the initial bed (only the first frame of the file is read)
+    """
+    reader = FrameReader(bed_filepath)
+    _, frame_lines = next(reader.raw_frames())
+
+    return _InitBed(reader.parse(frame_lines))
+
+def get_trajectories(bed_filepath: str, reduc_idx: list[int]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Function to get the positions of the particles over all timesteps, streaming the file one frame at a time
+        - Args
+            - `bed_filepath` : the dmp.reg file to read
+            - `reduc_idx` : the IDs of the particles to track
+        - Returns
+            - `timesteps` : (T,) array of the timesteps
+            - `xs`, `ys` : (T x K) arrays of the positions (columns in the order of `reduc_idx`, NaN where a particle is missing)
+    """
+    reader = FrameReader(bed_filepath)
+
+    timesteps, xs, ys = [], [], []
+    nan = { 'x' : np.nan, 'y' : np.nan }
+    for timestep, bedDict in reader.frames(ParticleFilter(ids=reduc_idx)):
+        timesteps.append(timestep)
+        xs.append([ bedDict.get(pID, nan)['x'] for pID in reduc_idx ])
+        ys.append([ bedDict.get(pID, nan)['y'] for pID in reduc_idx ])
+
+    shape = (len(timesteps), len(reduc_idx))
+    return np.array(timesteps), np.array(xs, dtype=float).reshape(shape), np.array(ys, dtype=float).reshape(shape)
 
-    path = f"{base.parent.absolute()}\\lammps_repeater\\iterations_A90\\iteration_V5.0_A90\\dmp.reg.LIS01_V5.0_A90"
+def get_arrivals(signal: np.ndarray, times: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Function to get the time at which the signal of each particle first reaches the threshold
+        - Args
+            - `signal` : (T x K) array (e.g. the acceleration magnitudes)
+            - `times` : (T,) array of the times
+            - `threshold` : the value the signal has to reach
+        - Returns
+            - (K,) array of the arrival times (NaN for the particles the pulse never reaches)
+    """
+    reached = np.abs(signal) >= threshold
+    first = reached.argmax(axis=0)
+
+    return np.where(reached.any(axis=0), np.asarray(times, dtype=float)[first], np.nan)
+
+def fit_speed(distances: np.ndarray, arrivals: np.ndarray) -> tuple[float, float]:
+    """
+    Function to fit the propagation speed of the pulse (arrival time = distance/speed + delay)
+        - Args
+            - `distances` : (K,) array of the distances of the particles from the source
+            - `arrivals` : (K,) array of the arrival times (NaN values are left out)
+        - Returns
+            - `speed` : distance per unit time (NaN if there are not enough arrivals or the fit is flat)
+            - `delay` : the arrival time at the source
+    """
+    valid = np.isfinite(arrivals) & np.isfinite(distances)
+    if np.unique(distances[valid]).size < 2:
+        return np.nan, np.nan
+
+    slowness, delay = np.polyfit(distances[valid], arrivals[valid], 1)
+    speed = 1/slowness if slowness > 0 else np.nan
+
+    return float(speed), float(delay)
+
+def get_pulse_map(bed_filepath: str, ratio: float = ARRIVAL_RATIO) -> dict:
+    """
+    Function to get the pulse of every surface particle (from a single pass over the dump file). The accelerations \
+        are computed as the frames stream in, so the first and last frames have none.
+        - Args
+            - `bed_filepath` : the dmp.reg file to examine
+            - `ratio` : the arrival threshold as a fraction of the largest acceleration
+        - Returns dictionary with
+            - `timesteps` : (T,) array
+            - `pIDs` : (K,) array of the surface particles, ordered by their initial x position
+            - `x0s` : (K,) array of the initial x positions
+            - `acc` : (T x K) array of the acceleration magnitudes
+            - `arrivals` : (K,) array of the arrival timesteps
+            - `source` : the x position where the pulse arrived first
+            - `speed`, `delay` : the fitted propagation speed (per timestep) and delay
+    """
+    initBed, surface = get_init_products(bed_filepath)
+
+    # ordering the particles along the surface
+    bedDict = initBed.get_input()
+    pIDs = np.array(sorted(surface, key = lambda pID: bedDict[pID]['x']), dtype=int)
+    x0s = np.array([ bedDict[pID]['x'] for pID in pIDs ])
+
+    timesteps, acc = [], []
+    reader = FrameReader(bed_filepath)
+    for state in reader.kinematics(ParticleFilter(ids=pIDs.tolist()), ids=pIDs.tolist()):
+        timesteps.append(state['timestep'])
+        acc.append( np.hypot(state['acc'][:, 0], state['acc'][:, 1]) )
+
+    timesteps = np.array(timesteps)
+    acc = np.array(acc, dtype=float).reshape(len(timesteps), len(pIDs))
+
+    arrivals = get_arrivals(acc, timesteps, ratio*np.nanmax(acc)) if acc.size else np.full(len(pIDs), np.nan)
+
+    source = x0s[np.nanargmin(arrivals)] if np.isfinite(arrivals).any() else np.nan
+    speed, delay = fit_speed(np.abs(x0s-source), arrivals)
+
+    return {
+        'timesteps' : timesteps,
+        'pIDs' : pIDs,
+        'x0s' : x0s,
+        'acc' : acc,
+        'arrivals' : arrivals,
+        'source' : source,
+        'speed' : speed,
+        'delay' : delay,
+    }
+
+def plot_pulse_map(path: str) -> None:
+    pulse = get_pulse_map(path)
+    timesteps, x0s, arrivals = pulse['timesteps'], pulse['x0s'], pulse['arrivals']
+
+    print(f"{len(x0s)} surface particles, pulse reached {np.isfinite(arrivals).sum()}")
+    print(f"Source: x = {pulse['source']:.4f}\tSpeed: {pulse['speed']:.4e} per timestep")
+
+    fig, ax = plt.subplots(1,2, figsize=(17,6))
+    fig.suptitle("Surface Pulse", fontweight = 'bold')
+
+    # acceleration of every surface particle over time
+    image = ax[0].pcolormesh(
+        timesteps, x0s, pulse['acc'].T,
+        shading = 'nearest',
+        cmap = "magma",
+    )
+    ax[0].plot(arrivals, x0s, 'c.', markersize = 3, label = "Arrival")
+    ax[0].set_title("Acceleration Magnitude")
+    ax[0].set_xlabel("Timestep")
+    ax[0].set_ylabel("Initial X")
+    ax[0].legend()
+    fig.colorbar(image, ax = ax[0])
+
+    # arrival time vs distance from the source, with the fitted speed
+    distances = np.abs(x0s-pulse['source'])
+    ax[1].scatter(distances, arrivals, s = 8, label = "Arrivals")
+    if np.isfinite(pulse['speed']):
+        fit_ds = np.linspace(0, np.nanmax(distances), 2)
+        ax[1].plot(fit_ds, fit_ds/pulse['speed'] + pulse['delay'], 'r--', label = f"Speed = {pulse['speed']:.3e}")
+    ax[1].set_title("Arrival Time vs Distance")
+    ax[1].set_xlabel("Distance from Source")
+    ax[1].set_ylabel("Timestep")
+    ax[1].legend()
+
+    plt.tight_layout()
+    plt.show()
+
+def plot_tracked(path: str) -> None:
     
     # Path for the big script
     # C:\\Users\\Student\\projects\\pulse_propagation\\surface_pulse_scripts\\dmp.reg.E_2.25e7
@@ -21,12 +183,8 @@ def main():
 
     """
 
-    # instantiating a bed object
-    pBed = RegFile(path)
-    timesteps = pBed.ts
-
     # getting the initial bed
-    initBed = pBed.get_init_bed()
+    initBed = get_init_bed(path)
 
     # picking out specific particles on the surface
     # reduc_idx1 = initBed.is_array_surface(np.linspace(0.15, 0.25, 3)) #type: ignore
@@ -42,43 +200,28 @@ def main():
 
 
     # getting the coordinates for the specific particles over all timesteps
+    timesteps, xs, ys = get_trajectories(path, reduc_idx)
+    times = range(len(timesteps))
 
-    # initializing the dictionary
-    particles = {}
-    for pID in reduc_idx:
-        particles[pID] = {
-            'x' : [],   # empty lists for x and y
-            'y' : []
-        }
-
-    # getting the coordinate information for each particle, for each timestep
-    for t in timesteps:
-        bed_reduc = pBed.get_bed(*t, reduc_idx)
-
-        for pID in reduc_idx:
-            particles[pID]['x'].append(bed_reduc.get_data('x')[pID])
-            particles[pID]['y'].append(bed_reduc.get_data('y')[pID])
-
+    # taking the second time derivative (over all the frames, with the same spacing as the time axis of the plots)
+    acc_xs = np.gradient(np.gradient(xs, len(timesteps), axis=0), len(timesteps), axis=0)
+    acc_ys = np.gradient(np.gradient(ys, len(timesteps), axis=0), len(timesteps), axis=0)
 
     # plotting the extracted data
     fig, ax = plt.subplots(1,3, figsize=(17,6))
 
     fig.suptitle("Tracked Particle Paths", fontweight = 'bold')
 
-    for key in particles:
-
-        # pos, vel, acc
-        pos_x_t = particles[key]['x']
-        pos_y_t = particles[key]['y']
+    for k, key in enumerate(reduc_idx):
 
-        # taking the second time derivative
-        acc_x_t = np.gradient(np.gradient(particles[key]['x'],len(timesteps)),len(timesteps))
-        acc_y_t = np.gradient(np.gradient(particles[key]['y'],len(timesteps)),len(timesteps))
+        acc_x_t = acc_xs[:, k]
+        acc_y_t = acc_ys[:, k]
+        x0, y0 = xs[0, k], ys[0, k]
 
         ax[0].plot(
-            range(len(timesteps)),
+            times,
             acc_x_t,
-            label = f"{str(key)}, (x,y) = ({particles[key]['x'][0] : .2f},{particles[key]['y'][0] : .2f})"
+            label = f"{str(key)}, (x,y) = ({x0 : .2f},{y0 : .2f})"
         )
         ax[0].set_title("Particle X vs Time")
         ax[0].set_xlabel("Time")
@@ -87,9 +230,9 @@ def main():
         ax[0].legend()
 
         ax[1].plot(
-            range(len(timesteps)),
+            times,
             acc_y_t,
-            label = f"{str(key)}, y = {particles[key]['y'][0] : .2f}"
+            label = f"{str(key)}, y = {y0 : .2f}"
         )
         ax[1].set_title("Particle Y vs Time")
         ax[1].set_xlabel("Time")
@@ -97,9 +240,9 @@ def main():
         ax[1].set_ylabel("Y")
 
         ax[2].plot(
-            range(len(timesteps)),
-            [ sqrt(ax**2 + ay**2) for ax,ay in zip(acc_x_t,acc_y_t) ],
-            label = f"{str(key)}, x = {particles[key]['x'][0] : .2f}"
+            times,
+            np.hypot(acc_x_t, acc_y_t),
+            label = f"{str(key)}, x = {x0 : .2f}"
         )
         ax[2].set_title("Acceleration Magnitude vs Time")
         ax[2].set_xlabel("Time")
@@ -110,6 +253,12 @@ def main():
     plt.tight_layout()
     plt.show()
 
+def main():
+    if MODE == "tracked":
+        plot_tracked(PULSE_PATH)
+    else:
+        plot_pulse_map(PULSE_PATH)
+
 
 if __name__ == "__main__":
     main()
@@ -1,99 +1,160 @@
-import os
+# animating the paths of the tracked particles. All of the data is computed before the animation starts,
+#     so every frame only hands (views of) the arrays to the lines, and all of the panels are drawn by a single update.
+import sys
 import numpy as np
 from pathlib import Path
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 
-from bed_analysis import RegFile
-
-# C:\Users\Student\projects\lammps_manager\Output_Refactor
-base = Path(os.getcwd())
-# path = "C:\\Users\\moosu\\projects\\Research\\lammps_manager\\lammps_repeater\\iterations_A90\\iteration_V5.0_A90\\dmp.reg.LIS01_V5.0_A90"
-path = f"{base.parent.absolute()}\\lammps_repeater\\iterations_A90\\iteration_V5.0_A90\\dmp.reg.LIS01_V5.0_A90"
-
-# instantiating a bed object
-pBed = RegFile(path)
-timesteps = pBed.ts
-# box_height = pBed.box_height
-# box_width = pBed.box_width
-
-# getting the initial bed
-initBed = pBed.get_init_bed()
-
-# picking out specific particles on the surface
-# reduc_idx = initBed.is_array_surface(np.linspace(0.15, 0.3, 10))
-
-reduc_idx = initBed.is_array('h',np.linspace(0.15,0.25,10),0.14)
-
-# getting the coordinates for the specific particles over all timesteps
-
-# initializing the dictionary
-particles = {}
-for pID in reduc_idx:
-    particles[pID] = {
-        'x' : [],   # empty lists for x and y
-        'y' : []
-    }
-
-# getting the coordinate information for each particle, for each timestep
-for t in timesteps:
-    bed_reduc = pBed.get_bed(*t, reduc_idx)
-
-    for pID in reduc_idx:
-        particles[pID]['x'].append(bed_reduc.get_data('x')[pID])
-        particles[pID]['y'].append(bed_reduc.get_data('y')[pID])
-
-# animating the data
-t = range(len(timesteps))
-
-ys = [ particles[idx]['y'] for idx in reduc_idx ]
-xs = [ particles[idx]['x'] for idx in reduc_idx ]
-vx = [np.gradient(x, len(timesteps)) for x in xs]
-vy = [np.gradient(y, len(timesteps)) for y in ys]
-
-fig, ax = plt.subplots(1,3, figsize=(17,6))
-fig.suptitle("Particle Paths", fontweight = "bold")
-
-# initializing the axis object with however many plots we need
-lines0 = [ ax[0].plot( [],[], label = f"x = {particles[i]['x'][0]: .3f}" )[0] for i in reduc_idx ]
-lines1 = [ ax[1].plot( [],[], label = f"x = {particles[i]['x'][0]: .3f}" )[0] for i in reduc_idx ]
-lines2 = [ ax[2].plot( [],[], label = f"x = {particles[i]['x'][0]: .3f}" )[0] for i in reduc_idx ]
-
-ax[0].set(title = "Y vs Time", xlim=(0,200), 
-    # ylim=(0.13,0.15)
-)
-ax[0].set_xlabel("Time")
-ax[0].set_ylabel("Height")
-ax[0].legend()
-
-ax[1].set(title = "X vs Time", xlim=(0,200), ylim=(0,0.35))
-ax[1].set_xlabel("Time")
-ax[1].set_ylabel("X Position")
-
-ax[2].set(title = "X vs Y", xlim=(0,0.35), 
-    # ylim=(0.13,0.15)
-)
-ax[2].set_xlabel("X Position")
-ax[2].set_ylabel("Y Position")
-
-# functions to update the data for each timestep
-def update(num, domain, ys, lines):
-    for line, y in zip(lines, ys):
-        line.set_data(domain[:num], y[:num])
-
-    return lines
-
-# xs has "len(reduc_idx)" many points, so it must also be iterated on
-def update2(num, domain, ys, lines):
-    for line, y, x in zip(lines, ys, domain):
-        line.set_data(x[:num], y[:num])
-    
-    return lines
-
-# calling the animator object
-anim1 = animation.FuncAnimation(fig, update, len(t), fargs=(t, vy, lines0), interval=25, blit=True, repeat=False)
-anim2 = animation.FuncAnimation(fig, update, len(t), fargs=(t, vx, lines1), interval=25, blit=True, repeat=False)
-anim3 = animation.FuncAnimation(fig, update2, len(t), fargs=(xs, ys, lines2), interval=25, blit=True, repeat=False)
-
-plt.tight_layout()
-plt.show()
+from surface_pulse_analysis import PULSE_PATH, get_init_bed, get_trajectories
+
+#* milliseconds between the frames when playing
+INTERVAL = 25
+
+#* frames per second when exporting
+FPS = 40
+
+#* the file to save the animation to (e.g. "pulse.mp4" or "pulse.gif"), it is played in a window if not given
+try:
+    EXPORT_PATH = sys.argv[2]
+except IndexError:
+    EXPORT_PATH = None
+
+class PulseAnimation:
+    """
+    Class to animate the paths of the tracked particles on multiple panels
+
+    - Args:
+        - `fig` : the figure to draw on
+        - `axes` : the axis of each panel
+        - `panels` : the (xs, ys) of each panel. Both are (T x K) arrays (a (T,) array is shared by all particles), \
+            with one column for each particle
+        - `labels` : the legend label of each particle (shown on the first panel)
+    """
+
+    def __init__(self, fig, axes, panels: list[tuple[np.ndarray, np.ndarray]], labels: list[str] = None) -> None:
+        self.fig = fig
+
+        #* the rows are the particles, so each line is handed a contiguous view
+        self.panels = []
+        for xs, ys in panels:
+            xs, ys = np.broadcast_arrays( np.asarray(xs, dtype=float).reshape(len(xs), -1), np.asarray(ys, dtype=float) )
+            self.panels.append( (np.ascontiguousarray(xs.T), np.ascontiguousarray(ys.T)) )
+
+        self.num_frames = self.panels[0][0].shape[1]
+
+        self.lines = []
+        for i, (ax, (xs, ys)) in enumerate(zip(axes, self.panels)):
+            lines = [
+                ax.plot(x, y, label = None if labels is None or i != 0 else labels[k])[0]
+                for k, (x, y) in enumerate(zip(xs, ys))
+            ]
+
+            # the limits are set from the whole path and kept while the lines grow
+            ax.relim()
+            ax.autoscale_view()
+            ax.set_autoscale_on(False)
+
+            self.lines.append(lines)
+
+        if labels is not None:
+            axes[0].legend()
+
+        self.update(0)
+
+    def update(self, num: int) -> list:
+        """
+        Method to draw the first `num` points of every path (on all panels)
+            - Returns
+                - the lines that changed
+        """
+        changed = []
+        for lines, (xs, ys) in zip(self.lines, self.panels):
+            for line, x, y in zip(lines, xs, ys):
+                line.set_data(x[:num], y[:num])
+            changed += lines
+
+        return changed
+
+    def animate(self, interval: int = INTERVAL, blit: bool = True, repeat: bool = False) -> animation.FuncAnimation:
+        """
+        Method to play the animation (keep the returned object alive while it plays)
+        """
+        return animation.FuncAnimation(
+            self.fig, self.update, range(1, self.num_frames+1),
+            interval = interval, blit = blit, repeat = repeat
+        )
+
+    def export(self, path: str, fps: int = FPS, every: int = 1) -> str:
+        """
+        Method to save the animation to a file without showing it
+            - Args
+                - `path` : the file to save to (.gif files use pillow, everything else ffmpeg)
+                - `fps` : frames per second of the file
+                - `every` : only every n-th frame is saved
+            - Returns
+                - the path of the saved file (a .gif if ffmpeg is not installed)
+        """
+        path = Path(path)
+        writer = "pillow" if path.suffix == ".gif" else "ffmpeg"
+        if writer == "ffmpeg" and not animation.writers.is_available("ffmpeg"):
+            print("ffmpeg not found, saving a gif instead")
+            path, writer = path.with_suffix(".gif"), "pillow"
+
+        frames = list(range(1, self.num_frames+1, every))
+        if frames[-1] != self.num_frames:
+            frames.append(self.num_frames)
+
+        anim = animation.FuncAnimation(self.fig, self.update, frames, blit = True, repeat = False)
+        anim.save(str(path), writer = writer, fps = fps)
+
+        return str(path)
+
+def main():
+    # getting the initial bed
+    initBed = get_init_bed(PULSE_PATH)
+
+    # picking out specific particles on the surface
+    # reduc_idx = initBed.is_array_surface(np.linspace(0.15, 0.3, 10))
+
+    reduc_idx = initBed.is_array('h',np.linspace(0.15,0.25,10),0.14)
+
+    # getting the coordinates for the specific particles over all timesteps
+    timesteps, xs, ys = get_trajectories(PULSE_PATH, reduc_idx)
+
+    # the same time derivative for all the particles
+    t = np.arange(len(timesteps))
+    vx = np.gradient(xs, len(timesteps), axis=0)
+    vy = np.gradient(ys, len(timesteps), axis=0)
+
+    fig, ax = plt.subplots(1,3, figsize=(17,6))
+    fig.suptitle("Particle Paths", fontweight = "bold")
+
+    ax[0].set(title = "Y vs Time")
+    ax[0].set_xlabel("Time")
+    ax[0].set_ylabel("Height")
+
+    ax[1].set(title = "X vs Time")
+    ax[1].set_xlabel("Time")
+    ax[1].set_ylabel("X Position")
+
+    ax[2].set(title = "X vs Y")
+    ax[2].set_xlabel("X Position")
+    ax[2].set_ylabel("Y Position")
+
+    pulse = PulseAnimation(
+        fig, ax,
+        [ (t, vy), (t, vx), (xs, ys) ],
+        labels = [ f"x = {x: .3f}" for x in xs[0] ],
+    )
+
+    plt.tight_layout()
+    if EXPORT_PATH is not None:
+        print(f"Animation saved to {pulse.export(EXPORT_PATH)}")
+        return
+
+    anim = pulse.animate()
+    plt.show()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# the (angle x velocity) grid of a sweep. Every iteration is indexed once by its (angle, velocity), so any decision
+#     or metric of the sweep can be looked up as an (angles x velocities) array without re-deriving the keys.
+#     - Rows are the angles, columns are the velocities (the same layout as the heatmaps)
+#     - The flat order (angles outer, velocities inner) is the order the iterations are processed in
+import numpy as np
+
+# the sweep grid
+ANGLES = np.linspace(20, 70, 11, dtype=int)
+VELOCITIES = np.linspace(1.0, 7.0, 13)
+
+# behaviors, in the order of their codes (FS -> 0, RO -> 1, RC -> 2)
+BEHAVIORS = ['FS', 'RO', 'RC']
+
+
+def iteration_key(angle: int, velocity: float) -> str:
+    """
+    Function to get the key of an iteration (e.g. "V1.0_A20")
+    """
+    return f"V{velocity}_A{angle}"
+
+
+def encode_labels(labels) -> np.ndarray:
+    """
+    Function to convert behavior labels ("FS", "RO", "RC") to their codes, for any shape of input
+        - Raises
+            - `ValueError` if a label is not one of `BEHAVIORS`
+    """
+    labels = np.asarray(labels)
+
+    uniques, inverse = np.unique(labels, return_inverse=True)
+    unknown = [ str(label) for label in uniques if label not in BEHAVIORS ]
+    if unknown:
+        raise ValueError(f"Unknown behavior labels: {unknown}")
+
+    lookup = np.array([ BEHAVIORS.index(label) for label in uniques ], dtype=int)
+    return lookup[inverse].reshape(labels.shape)
+
+
+def decode_labels(codes) -> np.ndarray:
+    """
+    Function to convert behavior codes back to their labels, for any shape of input
+    """
+    return np.array(BEHAVIORS, dtype=object)[np.asarray(codes, dtype=int)]
+
+
+class SweepGrid:
+    """
+    Class to look up the values of a sweep on the (angle x velocity) grid
+
+    - Args:
+        - `data` : dictionary keyed by the iteration keys ("V{velocity}_A{angle}"). The values are either \
+            single values (e.g. the human behaviors) or dictionaries of values (e.g. the computer behaviors)
+        - `angles`, `velocities` : the values of the grid
+    - Attributes:
+        - `keys` : (angles x velocities) array of the iteration keys
+        - `index` : dictionary of the (row, column) of each iteration key
+    """
+
+    def __init__(self, data: dict = None, angles = ANGLES, velocities = VELOCITIES) -> None:
+        self.angles = np.asarray(angles)
+        self.velocities = np.asarray(velocities)
+
+        self.keys = np.array([
+            [ iteration_key(angle, velocity) for velocity in self.velocities ] for angle in self.angles
+        ], dtype=object)
+        self.index = { key: idx for idx, key in np.ndenumerate(self.keys) }
+
+        self.data = data
+        self.__arrays = {}
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.keys.shape
+
+    @property
+    def flat_keys(self) -> list[str]:
+        """
+        The iteration keys in the flat order (angles outer, velocities inner)
+        """
+        return self.keys.ravel().tolist()
+
+    def locate(self, key: str) -> tuple[int, int]:
+        """
+        Method to get the (row, column) of an iteration key
+        """
+        return self.index[key]
+
+    def from_flat(self, values) -> np.ndarray:
+        """
+        Method to reshape values in the flat order onto the grid
+        """
+        return np.asarray(values).reshape(self.shape)
+
+    def get(self, field: str = None) -> np.ndarray:
+        """
+        Method to get a value of every iteration as an (angles x velocities) array. The array is built \
+            once and reused after that.
+            - Args
+                - `field` : the value to get from each iteration's dictionary (`None` if the values are not dictionaries)
+        """
+        if field not in self.__arrays:
+            if field is None:
+                values = [ self.data[key] for key in self.flat_keys ]
+            else:
+                values = [ self.data[key][field] for key in self.flat_keys ]
+
+            self.__arrays[field] = self.from_flat(values)
+
+        return self.__arrays[field]
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.get(field)
+
+    def codes(self, field: str = None) -> np.ndarray:
+        """
+        Method to get the behaviors of every iteration encoded as integers (FS -> 0, RO -> 1, RC -> 2)
+            - Args
+                - `field` : the behavior field of each iteration's dictionary (`None` if the values are the behaviors)
+        """
+        name = ('codes', field)
+        if name not in self.__arrays:
+            self.__arrays[name] = encode_labels(self.get(field))
+
+        return self.__arrays[name]
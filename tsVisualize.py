@@ -1,12 +1,16 @@
 # visualizing the bed at specific timesteps
 import sys
+import threading
 import numpy as np
+import concurrent.futures
+from collections import OrderedDict
 from matplotlib.widgets import TextBox
 from matplotlib import pyplot as plt
 import bed_analysis
+from bed_render import BedRenderer
 
 # setting the command line arguments
-from pathExtract import TASK_ID, get_points, get_path
+from pathExtract import TASK_ID, analyze_bed, get_path, get_init_products
 
 try:
     TASK_ID = sys.argv[1]
@@ -28,6 +32,135 @@ except IndexError:
     # setting default values
     timestep = 0 # initial timestep for no timestep input
 
+#* number of analyzed timesteps kept in memory
+CACHE_SIZE = 32
+
+#* number of timesteps on either side of the current one that are analyzed ahead of time
+PREFETCH_RADIUS = 2
+
+#* drawing the particles into an image with numpy (False to draw them as a marker collection)
+RASTER = True
+
+class VisualSession:
+    """
+    Class to hold an iteration for the interactive visualization. The dump files, the initial bed and the reduced \
+        bed are only read in once, and the analyzed timesteps are kept in an LRU cache. The timesteps next to the \
+        one being looked at are analyzed ahead of time on a background thread.
+        - The parsing and analysis are mostly pure Python and hold the GIL, so the thread barely overlaps with \
+            the drawing. It pays off in the time spent waiting for the next input, not while a frame is drawn.
+        - Only the bed frames that have disc data are kept, so the timestep index goes from 0 to `len(session)-1`
+
+    - Args:
+        - `bed_filepath` : the `dmp.reg` file to examine
+        - `disc_filepath` : the `dmp.disc` file to examine
+        - `cache_size` : the number of analyzed timesteps kept in memory
+        - `prefetch_radius` : the number of timesteps on either side that are analyzed ahead of time
+    """
+
+    def __init__(self, bed_filepath: str, disc_filepath: str, cache_size: int = CACHE_SIZE, prefetch_radius: int = PREFETCH_RADIUS) -> None:
+        self.Bed = bed_analysis.RegFile(bed_filepath)
+        self.Disc = bed_analysis.DiscFile(disc_filepath)
+
+        # the (index, timestep) of the bed frames that have disc data
+        self.ts = [ time for time in self.Bed.ts if time[1] in self.Disc.dataDict ]
+
+        # getting the initial/reduced bed (making this the same with pathExtract)
+        initBed, _ = get_init_products(bed_filepath)
+        self.reduc_idx = initBed.is_greater('y', 0.14)
+
+        self.cache_size = cache_size
+        self.prefetch_radius = prefetch_radius
+
+        self.__cache = OrderedDict()
+        self.__pending = {}
+        self.__lock = threading.Lock()
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __analyze(self, time_rel: int) -> dict:
+        #* the analysis of a single timestep
+        time = self.ts[time_rel]
+        discDatas = self.Disc.dataDict[time[1]]
+
+        particle_bed = self.Bed.get_bed(*time, self.reduc_idx)
+        crater, mound, touch_idx = analyze_bed(
+            particle_bed,
+            (
+                discDatas['disc_xs'],
+                discDatas['disc_ys'],
+                discDatas['disc_rs']
+            )
+        )
+
+        return {
+            'time' : time,
+            'disc' : discDatas,
+            'bed' : particle_bed,
+            'crater' : crater,
+            'mound' : mound,
+            'contacts' : touch_idx,
+        }
+
+    def __store(self, time_rel: int, frame: dict) -> None:
+        with self.__lock:
+            self.__cache[time_rel] = frame
+            self.__cache.move_to_end(time_rel)
+            while len(self.__cache) > self.cache_size:
+                self.__cache.popitem(last=False)
+
+    def __load(self, time_rel: int) -> dict:
+        frame = self.__analyze(time_rel)
+        self.__store(time_rel, frame)
+        with self.__lock:
+            self.__pending.pop(time_rel, None)
+        return frame
+
+    def __prefetch(self, time_rel: int) -> None:
+        # the closest timesteps first
+        for offset in range(1, self.prefetch_radius+1):
+            for neighbor in (time_rel+offset, time_rel-offset):
+                with self.__lock:
+                    if not 0 <= neighbor < len(self) or neighbor in self.__cache or neighbor in self.__pending:
+                        continue
+                    self.__pending[neighbor] = self.__executor.submit(self.__load, neighbor)
+
+    def get(self, time_rel: int) -> dict:
+        """
+        Method to get the analyzed timestep
+            - Args:
+                - `time_rel`: relative time that serves as the timestep index
+            - Returns:
+                - dictionary with the `time` (index, timestep) tuple, the `disc` data, the reduced `bed` (`_Bed` object), \
+                    and the `crater`, `mound` and `contacts` from `analyze_bed()`
+        """
+        if time_rel < 0:
+            time_rel += len(self)
+        if not 0 <= time_rel < len(self):
+            raise IndexError("Timestep out of range.")
+
+        with self.__lock:
+            frame = self.__cache.get(time_rel)
+            pending = self.__pending.get(time_rel)
+
+        if frame is not None:
+            self.__store(time_rel, frame)
+        elif pending is not None:
+            frame = pending.result()
+        else:
+            frame = self.__load(time_rel)
+
+        self.__prefetch(time_rel)
+        return frame
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+# the iteration being visualized and its renderer (set up once in main())
+session = None
+renderer = None
+
 # setting up the figure in the global context
 fig, ax = plt.subplots(figsize = (15,6))
 
@@ -39,7 +172,7 @@ def plotter(time_rel: int) -> None:
     """
     Function to visualize the bed at a specific timestep
         - Args:
-            - `time_rel`: relative time in range (0,200) that serves as the timestep index
+            - `time_rel`: relative time in range (0,len(session)-1) that serves as the timestep index
         - Plots a scatter plot that includes the following:
             - particle bed
             - mound height
@@ -47,139 +180,18 @@ def plotter(time_rel: int) -> None:
             - disc location
             - particles in contact
     """
+    # the analyzed timestep (cached by the session)
+    frame = session.get(time_rel)
+
     # specifying the timestep
     ax.set_title(f"(timestep: {time_rel})")
 
-    Bed = bed_analysis.RegFile( get_path("bed", angle, velocity) )
-    Disc = bed_analysis.DiscFile( get_path("disc", angle, velocity) )
-    
-    # the timestep to examine
-    time = [(t,b) for t,b in Bed.ts][time_rel]
-
-    # getting the disc data at the specified timestep
-    this = Disc.dataDict
-    discDatas = Disc.dataDict[time[1]]
-    
-    # getting the initial/reduced bed
-    initBed = Bed.get_init_bed()
-    reduc_idx = initBed.is_greater('y', 0.14)
-
-    # getting the coordinate points for mound/crater
-    (crater_x, crater_y), (mound_x, mound_y), touch_idx = get_points(
-        time, 
-        Bed, 
-        reduc_idx, # making this the same with pathExtract
-        (
-            discDatas['disc_xs'],
-            discDatas['disc_ys'],
-            discDatas['disc_rs']
-        )
-    )
-    
-
-    particle_bed = Bed.get_bed(*time, reduc_idx)
-    
-    #* Plotting
-    fig.suptitle(
-        f"{TASK_ID}: V = {velocity}, A = {angle}",
-        fontsize = 20, 
-        fontweight = "bold"
-    )
-    ax.set_facecolor("white")
-
-    # adding space to the bottom for the button
-    plt.subplots_adjust(bottom = 0.2)
-
-    
-
-    # scatter plot radius scaling
-    R_SCALE = 25000
-    # plotting the bed
-    ax.scatter(
-        particle_bed.get_data('x', as_array=True),
-        particle_bed.get_data('y', as_array=True),
-
-        #change the colormap profile
-        c = 'w',
-        s = np.multiply(particle_bed.get_data('r', as_array=True),R_SCALE),
-
-        # cmap = 'PuBu',
-        edgecolors='k',
-        linewidth = 0.5,
-    )
-    
-    # plotting the disc
-    ax.scatter(
-        discDatas['disc_xs'],
-        discDatas['disc_ys'],
-        c = "orange",
-        s = discDatas['disc_rs']*R_SCALE*7,
-        edgecolors = 'k',
-        linewidth = 1.0
-    )
-    ax.set_ylim( (0.13, 0.25) )
-    ax.set_xlim( (-0.01, Bed.box_width) )
-    
-    # plotting the surface
-    bed_asDict = particle_bed.get_input()
-    ax.scatter(
-        [ bed_asDict[key]['x'] for key in particle_bed.surface ],
-        [ bed_asDict[key]['y'] for key in particle_bed.surface ],
-        
-        c = "cyan",
-        s = np.multiply([ bed_asDict[key]['r'] for key in particle_bed.surface ], R_SCALE),
-        edgecolors = 'k',
-        linewidth = 0.5,
-
-        label = "Surface"
-    )
-
-    # plotting if contact particles exist
-    #? can track the mound/crater only after the particle is in contact with the bed !
-    if len(touch_idx) != 0:
-        particles_contact = Bed.get_bed(*time, touch_idx)
-        
-        ax.scatter(
-            particles_contact.get_data('x', as_array=True),
-            particles_contact.get_data('y', as_array=True),
-            
-            c = "magenta",
-            s = np.multiply( particles_contact.get_data('r', as_array=True), R_SCALE ),
-            edgecolors='k',
-            linewidth = 0.5,
-            
-            label = "Contact Particles"
-        )
-        
-        # crater arrow
-        ax.annotate(
-            f"Crater\n({crater_x:.4f},{crater_y:.4f})",
-            xy = (crater_x, crater_y), xycoords = "data",
-            xytext = (crater_x-0.05, crater_y+0.03), textcoords = "data",
-            arrowprops = dict( arrowstyle = "->" )
-        )
-        ax.annotate(
-            f"Mound\n({mound_x:.4f},{mound_y:.4f})",
-            xy = (mound_x, mound_y), xycoords = "data",
-            xytext = (mound_x-0.03, mound_y+0.01), textcoords = "data",
-            arrowprops = dict( arrowstyle = "->" )
-        )
-        
-        # adding the crater/mound labels to the legend
-        ax.scatter(
-            [0.15],
-            [0.15],
-            s = 0.00001,
-            label = f"Crater: ({crater_x:.4f},{crater_y:.4f})\nMound: ({mound_x:.4f},{mound_y:.4f})"
-        )
-
-
-    ax.legend()
-    plt.show()
+    #* only the data of the (persistent) artists is swapped
+    renderer.draw(frame)
+    fig.canvas.draw_idle()
 
 def submit(text):
     try:
-        ax.cla()
         plotter(int(text))
     except IndexError:
         pass
@@ -190,7 +202,26 @@ text_box.on_submit(submit)
 
 
 def main():
+    global session, renderer
+    session = VisualSession( get_path("bed", angle, velocity), get_path("disc", angle, velocity) )
+
+    #* Plotting
+    fig.suptitle(
+        f"{TASK_ID}: V = {velocity}, A = {angle}",
+        fontsize = 20, 
+        fontweight = "bold"
+    )
+
+    # adding space to the bottom for the button
+    plt.subplots_adjust(bottom = 0.2)
+
+    renderer = BedRenderer(ax, session.Bed.box_width, raster=RASTER)
+
+    # the index only covers the timesteps with disc data
+    text_box.label.set_text(f"Timestep (0-{len(session)-1}):   ")
+
     plotter(timestep)
+    plt.show()
 
 if __name__ == "__main__":
     main()
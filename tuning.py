@@ -0,0 +1,148 @@
+# grid search over the classifier thresholds. Every parameter set is scored by the match rate against the human
+#     behaviors, using the batch classifier over the whole sweep.
+#     - Parameter sets that share the feature thresholds are scored together, so the features are only computed
+#         once for each of them
+#     - The feature groups are spread over multiple processes
+import os
+import sys
+import json
+import itertools
+import numpy as np
+import concurrent.futures
+from time import perf_counter
+from dataclasses import asdict
+
+from pathExtract import TASK_ID, TRIAL_ID
+from post_processing import ClassifierParams, FEATURE_PARAMS
+from sweep_grid import SweepGrid, encode_labels
+from label_store import load_human_labels
+from batch_classifier import load_sweep, batch_features, batch_vote
+
+try:
+    TASK_ID = sys.argv[1]
+except IndexError:
+    pass
+try:
+    TRIAL_ID = sys.argv[2]
+except IndexError:
+    pass
+
+#* number of random parameter sets to try (the whole grid if not given)
+try:
+    NUM_SAMPLES = int(sys.argv[3])
+except IndexError:
+    NUM_SAMPLES = None
+
+#* values to try for each parameter (see ClassifierParams)
+GRID = {
+    'peak_distance' : [20, 30, 40, 50, 60],
+    'radius_ratio' : [1.0, (1197+8075)/8075, 1.25, 1.5],
+    'acc_band' : [5e-3, 1e-2, 2e-2, 5e-2],
+    'vel_band' : [(0.95, 1.05), (0.97, 1.03), (0.99, 1.01)],
+    'airborne_div' : [2, 4, 6, 8, 10, 12],
+    'min_RO' : [15, 20, 25, 30, 35, 40],
+    'contact_weight' : [0.0, 5.0, 10.0],
+}
+
+# number of best parameter sets to report
+TOP = 10
+
+# shared by the workers (set once by `_init_worker()`)
+_STACK = None
+_LABELS = None
+
+def get_param_sets(grid: dict, num_samples: int = None, seed: int = 0) -> list[ClassifierParams]:
+    """
+    Function to get the parameter sets to score
+        - Args
+            - `grid` : the values to try for each parameter
+            - `num_samples` : number of parameter sets sampled (without replacement) from the grid (`None` for the whole grid)
+            - `seed` : seed for the random sample
+        - Returns
+            - list of `ClassifierParams` objects
+    """
+    combos = list( itertools.product(*grid.values()) )
+    if num_samples is not None and num_samples < len(combos):
+        rng = np.random.default_rng(seed)
+        combos = [ combos[idx] for idx in rng.choice(len(combos), num_samples, replace=False) ]
+
+    return [ ClassifierParams(**dict(zip(grid.keys(), combo))) for combo in combos ]
+
+
+def _init_worker(stack: dict, labels: np.ndarray) -> None:
+    global _STACK, _LABELS
+    _STACK, _LABELS = stack, labels
+
+
+def score_group(param_sets: list[ClassifierParams]) -> list[tuple[ClassifierParams, float]]:
+    """
+    Function to score parameter sets that share the same feature thresholds
+        - Returns
+            - list of (parameter set, match rate)
+    """
+    features = batch_features(_STACK, param_sets[0])
+
+    scores = []
+    for params in param_sets:
+        decisions, _, _ = batch_vote(features, params)
+        scores.append( (params, float( np.mean(decisions == _LABELS) )) )
+
+    return scores
+
+
+def tune(task_id: str, trial_id: str, param_sets: list[ClassifierParams]) -> list[tuple[ClassifierParams, float]]:
+    """
+    Function to score the parameter sets against the human behaviors
+        - Returns
+            - list of (parameter set, match rate), best first
+    """
+    keys = SweepGrid().flat_keys
+
+    humanDict = load_human_labels(task_id)
+    labels = encode_labels([ humanDict[key] for key in keys ])
+
+    stack = load_sweep([
+        f"data_Extracts/data_Extract_{task_id}_{trial_id}/outputs_{key}.json" for key in keys
+    ])
+
+    # grouping the parameter sets by the feature thresholds
+    groups = {}
+    for params in param_sets:
+        groups.setdefault( tuple(getattr(params, name) for name in FEATURE_PARAMS), [] ).append(params)
+
+    scores = []
+    with concurrent.futures.ProcessPoolExecutor(initializer=_init_worker, initargs=(stack, labels)) as executor:
+        for result in executor.map(score_group, groups.values()):
+            scores.extend(result)
+
+    # the order of param_sets is kept on ties
+    return sorted(scores, key=lambda score: -score[1])
+
+
+def main():
+    param_sets = get_param_sets(GRID, NUM_SAMPLES)
+    print(f"Scoring {len(param_sets)} parameter sets")
+
+    scores = tune(TASK_ID, TRIAL_ID, param_sets)
+
+    default = next( (rate for params, rate in scores if params == ClassifierParams()), None )
+    if default is not None:
+        print(f"Default parameters: {default:.3f}")
+
+    print(f"\nBest {min(TOP, len(scores))} parameter sets:")
+    for params, rate in scores[:TOP]:
+        print(f"  {rate:.3f}  {params}")
+
+    os.makedirs("output_logs", exist_ok=True)
+    with open(f"output_logs/tuning_{TASK_ID}_{TRIAL_ID}.json", 'w') as file:
+        json.dump(
+            [ {'match_rate': rate, **asdict(params)} for params, rate in scores[:TOP] ],
+            file, indent=4
+        )
+
+if __name__ == "__main__":
+    start = perf_counter()
+    main()
+    end = perf_counter()
+
+    print(f"Total runtime: { int( (end-start)//60 ) }:{(end-start)%60 : .2f}")